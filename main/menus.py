@@ -2,6 +2,8 @@ from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 from menu import Menu, MenuItem
 
+from .utils import in_group
+
 Menu.add_item("main", MenuItem(_('main:menu:home'),
                                reverse('main:home'),
                                exact_url=True
@@ -15,9 +17,7 @@ Menu.add_item("main", MenuItem(_('main:menu:my_list'),
 Menu.add_item("main", MenuItem(_('main:menu:po_list'),
                                reverse('registrations:po_list'),
                                exact_url=True,
-                               check=lambda x: "PO" in [
-                                   g.name for g in x.user.groups.all()
-                               ],
+                               check=lambda x: in_group(x.user, "PO"),
                                ))
 
 
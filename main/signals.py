@@ -0,0 +1,43 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db.models.signals import post_save, post_delete, m2m_changed
+
+from .utils import forget_group_names
+
+USER_MODEL = get_user_model()
+
+
+def user_groups_changed(sender, instance, action, reverse, pk_set,
+                        **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        forget_group_names([instance.pk])
+    elif pk_set:
+        forget_group_names(pk_set)
+    else:
+        # A group was cleared, we don't know of whom
+        forget_group_names()
+
+
+def group_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    forget_group_names()
+
+
+m2m_changed.connect(
+    user_groups_changed,
+    sender=USER_MODEL.groups.through,
+    dispatch_uid="user_groups_changed",
+)
+post_save.connect(
+    group_changed,
+    sender=Group,
+    dispatch_uid="group_saved_user_groups",
+)
+post_delete.connect(
+    group_changed,
+    sender=Group,
+    dispatch_uid="group_deleted_user_groups",
+)
@@ -6,12 +6,16 @@ register = template.Library()
 @register.simple_tag(takes_context=True)
 def concat_get_params(context, **kwargs):
     """Generates get params to stick after a URL, so that ? and &
-    get put in the right places. It requires """
+    get put in the right places. It requires the current_get_params
+    context variable. Parameters given as None are left out."""
     if "current_get_params" in context:
         all_params = context["current_get_params"].copy()
     else:
-        all_params = QueryDict()
-    all_params.update(kwargs)
-    args = [k + "=" + str(v) for k, v in all_params.items()]
-    out = "?" + "&".join(args)
+        all_params = QueryDict(mutable=True)
+    for key, value in kwargs.items():
+        if value is None:
+            all_params.pop(key, None)
+        else:
+            all_params[key] = str(value)
+    out = "?" + all_params.urlencode()
     return out
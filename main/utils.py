@@ -1,7 +1,67 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
 from django.template import Template, loader
 from django.views.generic.base import ContextMixin
 from django.core.exceptions import ImproperlyConfigured
 
+# Group names are always fetched at most once per user object, so once
+# per request for request.user. With a timeout, they are also kept in
+# the cache between requests. Changes in group membership clear the
+# cached names, see main.signals.
+USER_GROUPS_CACHE_TIMEOUT = getattr(
+    settings,
+    "PROCREG_USER_GROUPS_CACHE_TIMEOUT",
+    None,
+)
+USER_GROUPS_GENERATION_KEY = "procreg:user_groups:generation"
+
+
+def get_user_groups_key(user_pk):
+    return f"procreg:user_groups:{user_pk}"
+
+
+def get_group_names(user):
+    """Return the set of names of the groups user is in."""
+    if not user.is_authenticated:
+        return frozenset()
+    try:
+        return user._group_names
+    except AttributeError:
+        pass
+    if not USER_GROUPS_CACHE_TIMEOUT:
+        user._group_names = frozenset(
+            user.groups.values_list("name", flat=True)
+        )
+        return user._group_names
+    key = get_user_groups_key(user.pk)
+    cached = cache.get_many([USER_GROUPS_GENERATION_KEY, key])
+    generation = cached.get(USER_GROUPS_GENERATION_KEY)
+    if generation is None:
+        generation = uuid.uuid4().hex
+        cache.add(USER_GROUPS_GENERATION_KEY, generation, None)
+    cached_generation, names = cached.get(key, (None, None))
+    if cached_generation != generation:
+        names = frozenset(user.groups.values_list("name", flat=True))
+        cache.set(key, (generation, names), USER_GROUPS_CACHE_TIMEOUT)
+    user._group_names = names
+    return names
+
+
+def in_group(user, group_name):
+    return group_name in get_group_names(user)
+
+
+def forget_group_names(user_pks=None):
+    """Clear the cached group names of the given users, or of all
+    users."""
+    if user_pks is None:
+        cache.set(USER_GROUPS_GENERATION_KEY, uuid.uuid4().hex, None)
+    else:
+        cache.delete_many([get_user_groups_key(pk) for pk in user_pks])
+
+
 class Renderable(ContextMixin):
 
     template_name = None
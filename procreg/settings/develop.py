@@ -96,6 +96,8 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'csp.middleware.CSPMiddleware',
+    # Only active in debug mode
+    'registrations.instrumentation.ServerTimingMiddleware',
 ]
 
 if DEBUG and ENABLE_DEBUG_TOOLBAR:
@@ -246,6 +248,10 @@ AUTH_USER_MODEL = 'main.User'
 
 LOGIN_URL = reverse_lazy('main:login')
 
+# Seconds to keep the group names of users in the cache between
+# requests. None only fetches them once per request.
+PROCREG_USER_GROUPS_CACHE_TIMEOUT = None
+
 LOGIN_REDIRECT_URL = reverse_lazy('main:home')
 
 
@@ -338,6 +344,14 @@ MENU_HIDE_EMPTY = False
 MEDIA_ROOT = 'media'
 MEDIA_URL = '/media/'
 
+# Attachments are downloaded through an access checked view. In
+# production, set this to 'xsendfile' (Apache, lighttpd) or 'nginx'
+# to have the web server send the file after the check. For nginx,
+# PROCREG_SENDFILE_URL_PREFIX must be an internal location aliasing
+# MEDIA_ROOT.
+PROCREG_SENDFILE_BACKEND = None
+PROCREG_SENDFILE_URL_PREFIX = '/protected-media/'
+
 
 try:
     from .saml_settings import *
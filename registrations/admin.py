@@ -1,14 +1,126 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.db.models import TextField
+from django.utils.translation import gettext_lazy as _
 
 from cdh.core.forms import TinyMCEWidget
 
-from .models import Registration, Involved, FaqList, Faq
+from .models import Registration, Involved, FaqList, Faq, Receiver, \
+    Software, StatusChange
+from . import transitions
 
 # Register your models here.
 
-admin.site.register(Registration)
-admin.site.register(Involved)
+
+def change_status(modeladmin, request, queryset, status):
+    result = transitions.bulk_transition(
+        queryset.values_list("pk", flat=True),
+        status,
+        request.user,
+    )
+    modeladmin.message_user(
+        request,
+        _("registrations:lists:bulk_status_changed").format(
+            changed=len(result.changed),
+        ),
+        messages.SUCCESS,
+    )
+    if result.skipped:
+        modeladmin.message_user(
+            request,
+            _("registrations:lists:bulk_status_skipped").format(
+                skipped=len(result.skipped),
+            ),
+            messages.WARNING,
+        )
+
+
+@admin.action(description=_("registrations:admin:mark_registered"))
+def mark_registered(modeladmin, request, queryset):
+    change_status(modeladmin, request, queryset, "registered")
+
+
+@admin.action(description=_("registrations:admin:return_to_draft"))
+def return_to_draft(modeladmin, request, queryset):
+    change_status(modeladmin, request, queryset, "draft")
+
+
+class ReceiverInline(admin.TabularInline):
+    model = Receiver
+    extra = 0
+
+
+class SoftwareInline(admin.TabularInline):
+    model = Software
+    extra = 0
+
+
+class InvolvedInline(admin.TabularInline):
+    """Details of involved groups are edited on their own page, so
+    that the registration form doesn't render their selections."""
+    model = Involved
+    fields = ["group_type", "name"]
+    extra = 0
+    show_change_link = True
+
+
+class RegistrationAdmin(admin.ModelAdmin):
+    list_display = [
+        "pk",
+        "registration_title",
+        "created_by",
+        "status",
+        "created_on",
+    ]
+    list_display_links = ["pk", "registration_title"]
+    list_filter = ["status"]
+    list_select_related = ["created_by"]
+    search_fields = ["registration_title"]
+    ordering = ["-created_on", "-pk"]
+    date_hierarchy = "created_on"
+    # Counting all registrations on every page load is slow for
+    # large tables
+    show_full_result_count = False
+    autocomplete_fields = ["created_by", "applicants"]
+    raw_id_fields = ["favourited_by"]
+    inlines = [InvolvedInline, ReceiverInline, SoftwareInline]
+    actions = [mark_registered, return_to_draft]
+
+
+class InvolvedAdmin(admin.ModelAdmin):
+    list_display = ["pk", "name", "group_type", "registration"]
+    list_filter = ["group_type"]
+    list_select_related = ["registration"]
+    search_fields = ["name"]
+    show_full_result_count = False
+    autocomplete_fields = ["registration"]
+    raw_id_fields = [
+        "special_details",
+        "other_sensitive_details",
+        "regular_details",
+        "social_media_details",
+        "extra_details",
+        "ic_form_details",
+    ]
+
+
+class StatusChangeAdmin(admin.ModelAdmin):
+    list_display = [
+        "registration",
+        "old_status",
+        "new_status",
+        "changed_by",
+        "changed_on",
+    ]
+    list_filter = ["new_status"]
+    list_select_related = ["registration", "changed_by"]
+    date_hierarchy = "changed_on"
+    show_full_result_count = False
+    raw_id_fields = ["registration", "changed_by"]
+
+
+admin.site.register(Registration, RegistrationAdmin)
+admin.site.register(Involved, InvolvedAdmin)
+admin.site.register(StatusChange, StatusChangeAdmin)
 
 
 class TinyMCEAdmin(admin.ModelAdmin):
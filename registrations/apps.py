@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class RegistrationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'registrations'
+
+    def ready(self):
+        # Connect signal receivers
+        from . import signals
@@ -0,0 +1,376 @@
+"""
+Query-count and latency benchmarks for the blueprint and page views.
+
+Synthetic registrations of increasing size are created inside a
+transaction that is rolled back afterwards. For every scenario the
+number of queries, wall time and peak Python memory are recorded.
+Run through the benchmark_blueprints management command.
+"""
+import statistics
+import time
+import tracemalloc
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import resolve, reverse
+
+from .blueprints import RegistrationBlueprint
+from .models import Registration, Involved, Receiver, Software, Attachment
+from .models.details import SpecialDetail, SensitiveDetail, RegularDetail, \
+    SocialMediaDetail, ICFormDetail, ExtraDetail
+
+
+# Number of sub-objects per fixture size
+SIZES = {
+    "tiny": {
+        "involved": 1,
+        "receivers": 1,
+        "software": 1,
+        "attachments": 1,
+        "registrations": 1,
+    },
+    "small": {
+        "involved": 5,
+        "receivers": 5,
+        "software": 5,
+        "attachments": 10,
+        "registrations": 10,
+    },
+    "medium": {
+        "involved": 25,
+        "receivers": 20,
+        "software": 20,
+        "attachments": 50,
+        "registrations": 50,
+    },
+    "large": {
+        "involved": 100,
+        "receivers": 50,
+        "software": 50,
+        "attachments": 100,
+        "registrations": 200,
+    },
+    "huge": {
+        "involved": 200,
+        "receivers": 100,
+        "software": 100,
+        "attachments": 250,
+        "registrations": 1000,
+    },
+}
+
+GROUP_TYPES = ["knowingly", "not_knowingly", "other"]
+
+DETAIL_MODELS = {
+    "special_details": SpecialDetail,
+    "other_sensitive_details": SensitiveDetail,
+    "regular_details": RegularDetail,
+    "social_media_details": SocialMediaDetail,
+    "ic_form_details": ICFormDetail,
+    "extra_details": ExtraDetail,
+}
+
+# Fields that let the consumer chain run all the way to the attachments
+COMPLETE_REGISTRATION = {
+    "faculty": "humanities",
+    "date_start": "2020-01-01",
+    "date_end": "2030-01-01",
+    "research_goal": "Benchmarking",
+    "involves_knowingly": True,
+    "involves_not_knowingly": True,
+    "involves_other": True,
+    "raw_storage_location": "Yoda",
+    "raw_data_decade": "yes",
+    "ic_storage_location": "Yoda",
+    "ic_storage_decade": "yes",
+    "audio_video_kept": "n_a",
+    "third_party_sharing": "yes",
+    "uses_software": "yes",
+    "follows_policy": "yes",
+    "policy_exceptions": "None",
+    "policy_additions": "None",
+}
+
+
+class Fixture():
+    """A synthetic registration, its owner and the surrounding
+    registrations needed for the list views."""
+
+    def __init__(self, size, user):
+        self.size = size
+        self.counts = SIZES[size]
+        self.user = user
+        self.registration = self.create_registration()
+        self.create_sub_objects()
+        self.create_other_registrations()
+
+    def create_registration(self):
+        return Registration.objects.create(
+            registration_title=f"Benchmark registration ({self.size})",
+            created_by=self.user,
+            **COMPLETE_REGISTRATION,
+        )
+
+    def create_sub_objects(self):
+        registration = self.registration
+        involved = Involved.objects.bulk_create(
+            [
+                Involved(
+                    registration=registration,
+                    group_type=GROUP_TYPES[n % len(GROUP_TYPES)],
+                    name=f"Group {n}",
+                    process_purpose="Benchmarking",
+                )
+                for n in range(self.counts["involved"])
+            ]
+        )
+        # Backends that don't return pks from bulk inserts
+        if involved and involved[0].pk is None:
+            involved = list(registration.involved_groups.order_by("pk"))
+        for field, model in DETAIL_MODELS.items():
+            details = model.objects.bulk_create(
+                [model(name=f"{field} {n}") for n in range(3)]
+            )
+            if details[0].pk is None:
+                details = list(model.objects.order_by("-pk")[:3])
+            through = getattr(Involved, field).through
+            through.objects.bulk_create(
+                [
+                    through(
+                        involved_id=group.pk,
+                        **{f"{model._meta.model_name}_id": detail.pk},
+                    )
+                    for group in involved
+                    for detail in details
+                ]
+            )
+        Receiver.objects.bulk_create(
+            [
+                Receiver(
+                    registration=registration,
+                    name=f"Receiver {n}",
+                    outside_eer="no",
+                )
+                for n in range(self.counts["receivers"])
+            ]
+        )
+        Software.objects.bulk_create(
+            [
+                Software(
+                    registration=registration,
+                    name=f"Software {n}",
+                    not_approved="no",
+                )
+                for n in range(self.counts["software"])
+            ]
+        )
+        Attachment.objects.bulk_create(
+            [
+                Attachment(
+                    registration=registration,
+                    file_description=f"Attachment {n}",
+                    upload=f"benchmark/attachment_{n}.pdf",
+                )
+                for n in range(self.counts["attachments"])
+            ]
+        )
+
+    def create_other_registrations(self):
+        statuses = [s[0] for s in Registration.STATUSES]
+        Registration.objects.bulk_create(
+            [
+                Registration(
+                    registration_title=f"Other registration {n}",
+                    created_by=self.user,
+                    status=statuses[n % len(statuses)],
+                )
+                for n in range(self.counts["registrations"] - 1)
+            ]
+        )
+
+
+class Measurement():
+
+    def __init__(self, scenario, size, repeat):
+        self.scenario = scenario
+        self.size = size
+        self.repeat = repeat
+        self.queries = []
+        self.times = []
+        self.peaks = []
+
+    def run(self, func):
+        for _ in range(self.repeat):
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                func()
+                elapsed = time.perf_counter() - start
+            self.queries.append(len(ctx.captured_queries))
+            self.times.append(elapsed)
+        # Tracing allocations slows everything down, so memory is
+        # measured in a separate run
+        tracemalloc.start()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.peaks.append(peak)
+        return self
+
+    def as_dict(self):
+        return {
+            "scenario": self.scenario,
+            "size": self.size,
+            "repeat": self.repeat,
+            "queries": max(self.queries),
+            "time_ms_median": round(statistics.median(self.times) * 1000, 3),
+            "time_ms_max": round(max(self.times) * 1000, 3),
+            "peak_memory_kib": round(max(self.peaks) / 1024, 1),
+        }
+
+
+class BlueprintBenchmark():
+    """Runs every scenario against fixtures of the requested sizes."""
+
+    # Isolated cache, so what is cached for the rolled back fixtures
+    # never ends up in the real cache
+    cache_settings = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "procreg-benchmarks",
+        },
+    }
+
+    def __init__(self, sizes=None, repeat=3):
+        self.sizes = sizes or list(SIZES.keys())
+        self.repeat = repeat
+        self.factory = RequestFactory()
+        self.results = []
+
+    def run(self):
+        with override_settings(CACHES=self.cache_settings):
+            with transaction.atomic():
+                user = self.create_user()
+                for size in self.sizes:
+                    fixture = Fixture(size, user)
+                    self.run_scenarios(fixture)
+                transaction.set_rollback(True)
+        return self.results
+
+    def create_user(self):
+        # Unique, as the fixtures are created in the real database
+        user = get_user_model().objects.create(
+            username=f"procreg-benchmark-{uuid.uuid4().hex}",
+            is_staff=False,
+        )
+        group, created = Group.objects.get_or_create(name="PO")
+        user.groups.add(group)
+        return user
+
+    def measure(self, scenario, size, func):
+        from django.core.cache import cache
+
+        def cold():
+            cache.clear()
+            return func()
+
+        result = Measurement(scenario, size, self.repeat).run(cold)
+        self.results.append(result.as_dict())
+        return result
+
+    def call_view(self, fixture, url, method="get", data=None):
+        """Call the view behind url directly, without middleware."""
+        match = resolve(url)
+        request = getattr(self.factory, method)(url, data=data or {})
+        request.user = fixture.user
+        response = match.func(request, *match.args, **match.kwargs)
+        if hasattr(response, "render"):
+            response.render()
+        return response
+
+    def get_scenarios(self, fixture):
+        """Return (name, function) for every scenario measured on
+        fixture."""
+        registration = fixture.registration
+        reg_kwargs = {"reg_pk": registration.pk}
+        question_kwargs = {
+            "reg_pk": registration.pk,
+            "question": "goal",
+            "question_pk": registration.pk,
+        }
+        scenarios = [
+            (
+                "blueprint",
+                lambda: RegistrationBlueprint(
+                    Registration.objects.get(pk=registration.pk),
+                ),
+            ),
+            (
+                "overview",
+                lambda: self.call_view(
+                    fixture,
+                    reverse("registrations:overview", kwargs=reg_kwargs),
+                ),
+            ),
+            (
+                "summary",
+                lambda: self.call_view(
+                    fixture,
+                    reverse("registrations:summary", kwargs=reg_kwargs),
+                ),
+            ),
+            (
+                "involved_manager",
+                lambda: self.call_view(
+                    fixture,
+                    reverse(
+                        "registrations:involved_manager",
+                        kwargs=reg_kwargs,
+                    ),
+                ),
+            ),
+            (
+                "question_edit_get",
+                lambda: self.call_view(
+                    fixture,
+                    reverse(
+                        "registrations:edit_question",
+                        kwargs=question_kwargs,
+                    ),
+                ),
+            ),
+            (
+                "question_edit_post",
+                lambda: self.call_view(
+                    fixture,
+                    reverse(
+                        "registrations:edit_question",
+                        kwargs=question_kwargs,
+                    ),
+                    method="post",
+                    data={"research_goal": "Benchmarking"},
+                ),
+            ),
+            (
+                "my_list",
+                lambda: self.call_view(
+                    fixture,
+                    reverse("registrations:my_list"),
+                ),
+            ),
+            (
+                "po_list",
+                lambda: self.call_view(
+                    fixture,
+                    reverse("registrations:po_list"),
+                ),
+            ),
+        ]
+        return scenarios
+
+    def run_scenarios(self, fixture):
+        for scenario, func in self.get_scenarios(fixture):
+            self.measure(scenario, fixture.size, func)
@@ -0,0 +1,99 @@
+from django.db.models import Prefetch, prefetch_related_objects
+
+from .models import Involved, Receiver, Software, Attachment
+
+
+class BlueprintData():
+    """
+    In-memory snapshot of a registration's sub-objects.
+
+    Everything the consumers need is fetched up front with a fixed
+    number of prefetch queries, however many involved groups, receivers
+    or attachments a registration has. Consumers read from this
+    snapshot instead of running their own queries.
+    """
+
+    # Related names on Registration which are cached by the snapshot
+    related_names = [
+        "involved_groups",
+        "receivers",
+        "software",
+        "attachments",
+    ]
+
+    def __init__(self, registration):
+        self.registration = registration
+        self.load()
+
+    def get_prefetches(self):
+        involved_details = [
+            "involved_groups__" + field.name
+            for field in Involved._meta.many_to_many
+        ]
+        return [
+            Prefetch(
+                "involved_groups",
+                queryset=Involved.objects.order_by("pk"),
+            ),
+            *involved_details,
+            Prefetch(
+                "receivers",
+                queryset=Receiver.objects.order_by("pk"),
+            ),
+            Prefetch(
+                "software",
+                queryset=Software.objects.order_by("pk"),
+            ),
+            Prefetch(
+                "attachments",
+                queryset=Attachment.objects.order_by("pk"),
+            ),
+        ]
+
+    def get_related_name(self, model):
+        """Return the related name under which sub-objects of given
+        model are loaded, or None."""
+        for name in self.related_names:
+            related = self.registration._meta.get_field(name)
+            if related.related_model is model:
+                return name
+        return None
+
+    def load(self, *related_names):
+        """(Re)load given sub-objects of the registration, or all of
+        them if none are given."""
+        related_names = related_names or self.related_names
+        # Drop anything prefetched earlier, which may be outdated
+        # if this is a reload
+        prefetched = getattr(
+            self.registration, "_prefetched_objects_cache", {},
+        )
+        for name in related_names:
+            prefetched.pop(name, None)
+        prefetch_related_objects(
+            [self.registration],
+            *[
+                prefetch for prefetch in self.get_prefetches()
+                if self.get_lookup(prefetch).split("__")[0] in related_names
+            ],
+        )
+        self.involved = list(self.registration.involved_groups.all())
+        self.receivers = list(self.registration.receivers.all())
+        self.software = list(self.registration.software.all())
+        self.attachments = list(self.registration.attachments.all())
+        self.involved_by_type = {}
+        for involved in self.involved:
+            self.involved_by_type.setdefault(
+                involved.group_type, [],
+            ).append(involved)
+
+    def get_lookup(self, prefetch):
+        if isinstance(prefetch, Prefetch):
+            return prefetch.prefetch_through
+        return prefetch
+
+    def get_involved(self, group_type=None):
+        """Return the involved groups of given type, or all of them."""
+        if group_type is None:
+            return list(self.involved)
+        return list(self.involved_by_type.get(group_type, []))
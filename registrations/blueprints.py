@@ -1,13 +1,16 @@
 from django.urls import reverse
 from .questions import QUESTIONS
 
+import bisect
 import logging
 
 
 from cdh.questions.blueprints import Blueprint
 
 from .models import Registration, Involved
-# from .progress import RegistrationProgressBar
+from .blueprint_data import BlueprintData
+from .progress import RegistrationProgressBar
+from .instrumentation import profile_consumers
 from .consumers import TopQuestionsConsumer, NewRegistrationConsumer, \
     FacultyConsumer
 
@@ -17,58 +20,123 @@ debug = logging.debug
 
 
 
+class BlueprintError():
+    """
+    A single error added by a consumer. Errors mostly have the shape
+    (slug, field, message), but may be shorter or longer. They behave
+    like the tuple of their parts.
+    """
+
+    __slots__ = ("slug", "field", "message", "extra", "size")
+
+    def __init__(self, *args):
+        self.size = len(args)
+        self.slug, self.field, self.message = (args + (None,) * 3)[:3]
+        self.extra = args[3:]
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        return tuple(self)[index]
+
+    def __iter__(self):
+        parts = (self.slug, self.field, self.message)[:self.size]
+        yield from parts
+        yield from self.extra
+
+    def __eq__(self, other):
+        if not isinstance(other, (BlueprintError, tuple, list)):
+            return NotImplemented
+        return tuple(self) == tuple(other)
+
+    def __hash__(self):
+        # Equal to the tuple of its parts, so hashed like it
+        return hash(tuple(self))
+
+    def __repr__(self):
+        return f"BlueprintError{tuple(self)!r}"
+
+    def matches(self, filters, start=0):
+        """Return True if every filter from start onward matches the
+        part at the same position. Filters are values, which must be
+        equal, or callables which must return True."""
+        if self.size < len(filters):
+            return False
+        parts = tuple(self)
+        for position in range(start, len(filters)):
+            current = filters[position]
+            if callable(current):
+                if not current(parts[position]):
+                    return False
+            elif parts[position] != current:
+                return False
+        return True
+
+
 class BlueprintErrors():
+    """
+    The errors found by the consumers, indexed on slug and on
+    (slug, field).
+
+    errors.search(slug) or errors[slug] returns the errors of a
+    question, errors[slug, field] those of a single field. Callables
+    can be passed instead of values to filter on anything else,
+    which requires walking all candidate errors.
+    """
 
     def __init__(self):
         self.all_errors = []
+        self.by_slug = {}
+        self.by_slug_field = {}
 
     def add(self, *args):
-        self.all_errors.append(args)
+        error = BlueprintError(*args)
+        self.all_errors.append(error)
+        if len(error) >= 1:
+            self.by_slug.setdefault(error.slug, []).append(error)
+        if len(error) >= 2:
+            self.by_slug_field.setdefault(
+                (error.slug, error.field), [],
+            ).append(error)
+
+    def __len__(self):
+        return len(self.all_errors)
+
+    def truncate(self, size):
+        """Drop all errors added after the first size errors."""
+        # Errors are indexed in the order they were added, so they
+        # are always the last ones in their index lists
+        while len(self.all_errors) > size:
+            error = self.all_errors.pop()
+            if len(error) >= 1:
+                self.by_slug[error.slug].pop()
+            if len(error) >= 2:
+                self.by_slug_field[(error.slug, error.field)].pop()
 
     def search(self, *args):
-        result = []
-        for e in self.all_errors:
-            if self.rfilter2(e, args)[-1] != EndStop:
-                result.append(e)
-        return result
-
-    def __getitem__(self, *args):
-        return self.search(*args)
-
-    def rfilter2(self, sample, args, depth=0):
-        """Sequentially filter a list of items through a list of filters"""
-        # First, the case in which we've exhausted our samples
-        if len(sample) == 0:
-            # If there are no more args, then it's a perfect match
-            if len(args) == 0:
-                return [sample]
-            # If there are still unmatched filters, add an EndStop
-            # to mark the failure
-            else:
-                return [EndStop]
-        # Below is the general case in which we still have samples left
-        if len(args) == 0:
-            # No more filters, so all we have left matches by default
-            return [sample]
-        # Define current filter from args
+        """Return the errors whose first parts match args."""
+        # Leading values can be looked up in the indexes
+        exact = 0
+        for arg in args[:2]:
+            if callable(arg):
+                break
+            exact += 1
+        if exact == 2:
+            candidates = self.by_slug_field.get((args[0], args[1]), [])
+        elif exact == 1:
+            candidates = self.by_slug.get(args[0], [])
         else:
-            if not callable(args[0]):
-                # Non-callable just wants an exact match
-                def current(x):
-                    return x == args[0]
-            else:
-                # Current filter was already callable
-                current = args[0]
-        if not current(sample[0]):
-            # Filter doesn't match, so stop matching here
-            return [ EndStop ]
-        # Default result, return current match and filtered remainder
-        return [sample[0]] + self.rfilter2(sample[1:], args[1:])
+            candidates = self.all_errors
+        if len(args) == exact:
+            return list(candidates)
+        return [e for e in candidates if e.matches(args, start=exact)]
 
+    def __getitem__(self, key):
+        if isinstance(key, tuple):
+            return self.search(*key)
+        return self.search(key)
 
-class EndStop:
-    pass
-        
 
 class CompletedList(list):
 
@@ -79,6 +147,144 @@ class CompletedList(list):
         return super().append(item)
 
 
+class QuestionList(list):
+    """
+    List of instantiated questions which keeps indexes on slug, on
+    (slug, instance pk) and on involved group, so lookups don't have
+    to walk every question.
+    """
+
+    def __init__(self, blueprint):
+        super().__init__()
+        self.blueprint = blueprint
+        self.by_slug = {}
+        self.by_slug_pk = {}
+        self.by_involved = {}
+
+    def _involved_key(self, involved):
+        # Unsaved groups can only be told apart by identity
+        if involved.pk is None:
+            return (None, id(involved))
+        return involved.pk
+
+    def _index(self, question):
+        slug = getattr(question, "slug", None)
+        self.by_slug.setdefault(slug, []).append(question)
+        instance = getattr(question, "instance", None)
+        if instance is not None:
+            self.by_slug_pk.setdefault(
+                (slug, instance.pk), [],
+            ).append(question)
+        if isinstance(instance, Involved):
+            self.by_involved.setdefault(
+                self._involved_key(instance), [],
+            ).append(question)
+
+    def reindex(self):
+        self.by_slug = {}
+        self.by_slug_pk = {}
+        self.by_involved = {}
+        for question in self:
+            self._index(question)
+
+    def append(self, question):
+        super().append(question)
+        self._index(question)
+
+    def extend(self, questions):
+        for question in questions:
+            self.append(question)
+
+    def __iadd__(self, questions):
+        self.extend(questions)
+        return self
+
+    def insert(self, index, question):
+        super().insert(index, question)
+        self.reindex()
+
+    def remove(self, question):
+        super().remove(question)
+        self.reindex()
+
+    def pop(self, *args):
+        question = super().pop(*args)
+        self.reindex()
+        return question
+
+    def clear(self):
+        super().clear()
+        self.reindex()
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.reindex()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.reindex()
+
+    def with_slug(self, slug):
+        return list(self.by_slug.get(slug, []))
+
+    def with_slug_and_pk(self, slug, pk):
+        """Return questions with given slug whose instance has given pk,
+        which may be None for unsaved instances."""
+        if pk is None:
+            # Deleting an instance sets its pk to None, wherever it
+            # was indexed, so look at every question with this slug
+            return [
+                q for q in self.by_slug.get(slug, [])
+                if getattr(q, "instance", None) is not None
+                and q.instance.pk is None
+            ]
+        indexed = self.by_slug_pk.get((slug, pk), [])
+        # Saving or deleting an instance changes its pk after it was
+        # indexed, so every hit is checked. An instance can only
+        # gain a pk if it was unsaved, and there is usually just one
+        # of those per slug.
+        stale = any(q.instance.pk != pk for q in indexed) or any(
+            q.instance.pk is not None
+            for q in self.by_slug_pk.get((slug, None), [])
+        )
+        if stale:
+            self.reindex()
+            indexed = self.by_slug_pk.get((slug, pk), [])
+        return list(indexed)
+
+    def with_involved(self, involved):
+        """Return questions whose instance is given involved group."""
+        key = self._involved_key(involved)
+        match = self.by_involved.get(key, [])
+        stale = any(
+            self._involved_key(q.instance) != key for q in match
+        )
+        if not match:
+            # It may have been saved or deleted after its questions
+            # were indexed
+            if involved.pk is None:
+                stale = True
+            else:
+                stale = (None, id(involved)) in self.by_involved
+        if stale:
+            self.reindex()
+            match = self.by_involved.get(key, [])
+        return list(match)
+
+
+class ConsumerStep():
+    """
+    Record of a single consumer run: the consumer, the consumers still
+    waiting after it, and the sizes of the blueprint's lists before it
+    ran. This allows resuming the chain from any consumer.
+    """
+
+    def __init__(self, consumer, pending, sizes):
+        self.consumer = consumer
+        self.pending = tuple(pending)
+        self.sizes = sizes
+
+
 class RegistrationBlueprint(Blueprint):
     """
     The blueprint for a ProcReg registration.
@@ -92,11 +298,18 @@ class RegistrationBlueprint(Blueprint):
         FacultyConsumer,
         TopQuestionsConsumer,
     ]
+    # Blueprint lists that consumers only ever append to
+    tracked_lists = [
+        "questions",
+        "desired_next",
+        "top_questions",
+        "selected_groups",
+        "completed",
+    ]
 
     def __init__(self, registration):
         """Initialize the progress bar and continue"""
         super().__init__(registration)
-        # self.progress_bar = RegistrationProgressBar(self)
         self.desired_next = []
         self.top_questions = []
         # These are the selected groups of subjects such as consent,
@@ -105,9 +318,107 @@ class RegistrationBlueprint(Blueprint):
         # Completed is the list of items which are considered
         # correctly filled in. They show up on the summary page.
         self.completed = CompletedList(self)
-        self.questions = []
+        self.questions = QuestionList(self)
         self.errors = BlueprintErrors()
+        # Sub-objects of the registration, fetched once for all consumers
+        self.data = BlueprintData(self.object)
         self.start()
+        # Built when first rendered
+        self.progress_bar = RegistrationProgressBar(self)
+
+    def start(self):
+        self.steps = []
+        self.run_consumers(self.starting_consumers)
+
+    def run_consumers(self, consumers, kind="build"):
+        """
+        Run consumers depth-first, so that the consumers returned by a
+        consumer run before the ones that were already waiting. Every
+        run is recorded as a ConsumerStep, and profiled, see
+        registrations.instrumentation.
+        """
+        pending = list(consumers)
+        with profile_consumers(self, kind) as profile:
+            while pending:
+                consumer = pending.pop(0)
+                self.steps.append(
+                    ConsumerStep(consumer, pending, self.get_sizes()),
+                )
+                if profile is None:
+                    next_consumers = consumer(self).consume()
+                else:
+                    with profile.measure(consumer):
+                        next_consumers = consumer(self).consume()
+                pending = list(next_consumers or []) + pending
+
+    def get_sizes(self):
+        sizes = {
+            name: len(getattr(self, name)) for name in self.tracked_lists
+        }
+        sizes["errors"] = len(self.errors)
+        return sizes
+
+    def rewind(self, step_index):
+        """Undo everything consumers did from given step onward, and
+        return that step."""
+        step = self.steps[step_index]
+        del self.steps[step_index:]
+        for name in self.tracked_lists:
+            del getattr(self, name)[step.sizes[name]:]
+        self.errors.truncate(step.sizes["errors"])
+        return step
+
+    def find_step(self, question_index):
+        """Return the index of the step which appended the question at
+        question_index."""
+        sizes = [step.sizes["questions"] for step in self.steps]
+        return bisect.bisect_right(sizes, question_index) - 1
+
+    def find_question_index(self, slug, instance):
+        for question in self.questions.with_slug(slug):
+            if getattr(question, "instance", None) is instance:
+                return self.questions.index(question)
+        return None
+
+    def reevaluate(self, slug, instance):
+        """
+        Bring the blueprint up to date after instance was saved through
+        the question with given slug, by re-running only the consumers
+        from the one that appended that question onward.
+
+        Returns False if the question can't be found, in which case the
+        blueprint has to be rebuilt instead.
+
+        Consumers must never read answers to questions that are
+        appended after their own. Consumers before the saved question
+        don't run again, so what they decided from such an answer would
+        go stale. Nothing enforces this. The
+        ReevaluateTests in registrations.tests compare the outcome with
+        a new blueprint for every answer to every question.
+        """
+        index = self.find_question_index(slug, instance)
+        if index is None:
+            return False
+        related_name = self.data.get_related_name(type(instance))
+        if related_name:
+            # Sub-objects of this type get fetched again, so every
+            # consumer that used the old ones has to run again
+            model = type(instance)
+            for n, question in enumerate(self.questions[:index]):
+                if getattr(question, "model", None) is model:
+                    index = n
+                    break
+            self.data.load(related_name)
+        step = self.rewind(self.find_step(index))
+        self.run_consumers(
+            [step.consumer, *step.pending],
+            kind="reevaluate",
+        )
+        # Saving bumped the revision, but possibly on another copy
+        # of the registration
+        self.object.forget_revision()
+        self.progress_bar = RegistrationProgressBar(self)
+        return True
 
     def get_desired_next(self, index=1):
         try:
@@ -137,24 +448,30 @@ class RegistrationBlueprint(Blueprint):
         Get questions matching kwargs from this blueprints list of
         instantiated questions.
         """
-        match = []
-        # Basic matching on attributes
-        for q in self.questions:
-            if slug is not None:
-                if q.slug != slug:
-                    continue
-            if not isinstance(question_pk, bool):
+        # Basic matching on attributes, using the indexes
+        # kept by QuestionList where possible
+        if slug is not None:
+            if isinstance(question_pk, bool):
+                match = self.questions.with_slug(slug)
+            else:
                 # We want a question with a specific pk,
                 # which may include None to specifically
                 # find a question with an unsaved instance
-                if q.instance.pk != question_pk:
-                    continue
-            if question_pk is True:
-                # We don't care about the instance pk other
-                # than that it's defined
-                if q.instance.pk is None:
-                    continue
-            match.append(q)
+                match = self.questions.with_slug_and_pk(slug, question_pk)
+        else:
+            match = list(self.questions)
+            if not isinstance(question_pk, bool):
+                match = [
+                    q for q in match
+                    if hasattr(q, "instance") and q.instance.pk == question_pk
+                ]
+        if question_pk is True:
+            # We don't care about the instance pk other
+            # than that it's defined
+            match = [
+                q for q in match
+                if hasattr(q, "instance") and q.instance.pk is not None
+            ]
         # Extra arbitrary filter
         if extra_filter:
             match = list(
@@ -194,61 +511,29 @@ class RegistrationBlueprint(Blueprint):
                 "other",
             ]
 
-        def make_question_filter(our_involved):
-            """Return a filtering function determining if given question
-            has given involved group as instance"""
-            def filter_function(question):
-                question_model = getattr(question, "model", False)
-                if question_model:
-                    if question_model is Involved:
-                        return question.instance is our_involved
-                return False
-            return filter_function
-
         out = dict()
         for key in group_types:
-            qs = Involved.objects.filter(
-                registration=self.object,
-                group_type=key,
-            )
+            groups = self.data.get_involved(key)
             out[key] = {
                 "group_type": "models:involved:group_type_" + key,
-                "groups": [involved for involved in qs],
+                "groups": groups,
                 "questions": {
-                    involved: self.get_question(
-                        extra_filter=make_question_filter(involved),
-                        always_list=True,
-                    )
-                    for involved in qs
+                    involved: self.questions.with_involved(involved)
+                    for involved in groups
                 }
             }
         return out
 
     def get_questions_for_involved(self, involved):
-
-        def make_question_filter(our_involved):
-            """Return a filtering function determining if given question
-            has given involved group as instance"""
-            def filter_function(question):
-                try:
-                    return question.instance == our_involved
-                except AttributeError:
-                    return False
-                return False
-            return filter_function
-
-        return self.get_question(
-            extra_filter=make_question_filter(involved),
-            always_list=True,
-        )
+        return self.questions.with_involved(involved)
 
     def any_involved_group_available(self):
         """Return True if there is any involved group available to populate
         that section of the progress bar."""
-        for inv_type in self.get_involved_groups().values():
-            if len(inv_type["groups"]) > 0:
-                return True
-        return False
+        return any(
+            self.data.get_involved(group_type)
+            for group_type in self.object.list_involved_types()
+        )
 
     def instantiate_question(self, question_or_list, **kwargs):
         """
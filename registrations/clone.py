@@ -0,0 +1,113 @@
+"""
+Copying a registration with everything in it.
+
+Sub-objects are copied with bulk_create, and the detail relations of
+involved groups with bulk inserts into their through tables, so that
+the number of queries doesn't depend on the size of the registration.
+Bulk inserts don't send signals, so the revision of the copy is bumped
+once, at the end, and its search document is built once, after the
+commit. Attachments are copied as references to the same stored files,
+see registrations.storage.
+"""
+from django.db import connection, transaction
+
+from .models import Registration, Involved, Receiver, Software, Attachment
+
+# Fields that belong to the registration, not to its contents
+NOT_COPIED = [
+    "id",
+    "created_by",
+    "created_on",
+    "status",
+    "revision",
+]
+
+
+def copy_fields(obj, exclude, **values):
+    """Return an unsaved copy of obj with values changed."""
+    fields = {
+        field.attname: getattr(obj, field.attname)
+        for field in obj._meta.concrete_fields
+        if field.name not in exclude and not field.primary_key
+    }
+    fields.update(values)
+    return type(obj)(**fields)
+
+
+def clone_involved(source, registration):
+    """Copy the involved groups of source to registration, with their
+    detail relations."""
+    originals = list(source.involved_groups.order_by("pk"))
+    copies = Involved.objects.bulk_create(
+        [
+            copy_fields(involved, ["registration"], registration=registration)
+            for involved in originals
+        ],
+    )
+    if not connection.features.can_return_rows_from_bulk_insert:
+        # The copies didn't get their primary keys. The registration is
+        # new, so its involved groups are the copies, in the order of
+        # their originals.
+        copies = list(registration.involved_groups.order_by("pk"))
+    new_pks = {
+        original.pk: copy.pk for original, copy in zip(originals, copies)
+    }
+    if not new_pks:
+        return copies
+    for field in Involved._meta.many_to_many:
+        through = field.remote_field.through
+        # Names of the foreign keys in the through table
+        involved_column = field.m2m_column_name()
+        detail_column = field.m2m_reverse_name()
+        rows = through.objects.filter(
+            **{f"{involved_column}__in": new_pks.keys()},
+        ).values_list(involved_column, detail_column)
+        through.objects.bulk_create(
+            [
+                through(
+                    **{
+                        involved_column: new_pks[involved_pk],
+                        detail_column: detail_pk,
+                    }
+                )
+                for involved_pk, detail_pk in rows
+            ]
+        )
+    return copies
+
+
+def clone_registration(source, user, title=None):
+    """
+    Return a new draft registration created by user, with the answers,
+    applicants, involved groups, receivers, software and attachments
+    of source.
+    """
+    with transaction.atomic():
+        registration = copy_fields(
+            source,
+            NOT_COPIED,
+            created_by=user,
+        )
+        if title is not None:
+            registration.registration_title = title
+        registration.save()
+        Applicants = Registration.applicants.through
+        Applicants.objects.bulk_create(
+            [
+                Applicants(registration_id=registration.pk, user_id=pk)
+                for pk in source.applicants.values_list("pk", flat=True)
+            ]
+        )
+        clone_involved(source, registration)
+        for model in [Receiver, Software, Attachment]:
+            model.objects.bulk_create(
+                [
+                    copy_fields(obj, ["registration"], registration=registration)
+                    for obj in model.objects.filter(registration=source)
+                ]
+            )
+        # Bulk inserts don't send signals. Saving the registration
+        # already scheduled its search document to be built after the
+        # commit, when everything has been copied.
+        registration.bump_revision()
+    return registration
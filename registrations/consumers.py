@@ -262,12 +262,8 @@ class BaseGroupConsumer(BaseQuestionConsumer):
             )
 
     @property
-    def group_qs(self):
-        registration = self.blueprint.object
-        return Involved.objects.filter(
-            registration=registration,
-            group_type=self.group_type,
-        )
+    def groups(self):
+        return self.blueprint.data.get_involved(self.group_type)
 
     def instantiate(self):
         """Add a question with empty Involved for new group creation"""
@@ -285,7 +281,7 @@ class BaseGroupConsumer(BaseQuestionConsumer):
         # This will allow the user to create new groups
         self.blueprint.questions.append(self.question)
         # Then search for existing groups to manage
-        for group in self.group_qs:
+        for group in self.groups:
             # Instantiate the question with instance
             iq = self.question_class(
                 instance=group,
@@ -303,7 +299,7 @@ class BaseGroupConsumer(BaseQuestionConsumer):
         return True
 
     def has_entries(self):
-        return not len(self.group_qs) == 0
+        return not len(self.groups) == 0
 
     def add_purpose(self, instance):
         self.success_list.insert(0, PurposeConsumer(instance))
@@ -446,7 +442,7 @@ class NewReceiverConsumer(BaseConsumer):
         return []
 
     def at_least_one_created(self):
-        return self.get_queryset().count() > 0
+        return len(self.get_queryset()) > 0
 
     def no_errors(self):
         return True
@@ -472,9 +468,7 @@ class NewReceiverConsumer(BaseConsumer):
         self.blueprint.questions += self.questions
 
     def get_queryset(self):
-        return Receiver.objects.filter(
-            registration=self.blueprint.object,
-        )
+        return self.blueprint.data.receivers
 
     def none_added(self):
         self.blueprint.errors.add(
@@ -528,12 +522,10 @@ class NewSoftwareConsumer(BaseConsumer):
         self.blueprint.questions += self.questions
 
     def at_least_one_created(self):
-        return self.get_queryset().count() > 0
+        return len(self.get_queryset()) > 0
 
     def get_queryset(self):
-        return Software.objects.filter(
-            registration=self.blueprint.object,
-        )
+        return self.blueprint.data.software
 
     def no_errors(self):
         return True
@@ -556,9 +548,8 @@ class AttachmentsConsumer(RegistrationConsumer):
     question_class = AttachmentsQuestion
 
     def instantiate_attachments(self):
-        registration = self.blueprint.object
         # Instantiate questions for existing attachments
-        for attachment in self.question.get_queryset():
+        for attachment in self.blueprint.data.attachments:
             self.blueprint.questions.append(
                 NewAttachmentQuestion(
                     instance=attachment,
@@ -0,0 +1,157 @@
+"""
+Serving attachment files after access checks.
+
+When the front-end web server supports it, the transfer itself is
+handed off to it with an X-Sendfile (Apache, lighttpd) or
+X-Accel-Redirect (nginx) header, see PROCREG_SENDFILE_BACKEND.
+Otherwise Django streams the file, supporting single byte ranges and
+conditional requests so that clients don't download what they already
+have.
+"""
+import mimetypes
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import content_disposition_header, http_date, \
+    parse_http_date_safe
+
+# None, "xsendfile" or "nginx"
+SENDFILE_BACKEND = getattr(settings, "PROCREG_SENDFILE_BACKEND", None)
+# Internal nginx location which maps to MEDIA_ROOT
+SENDFILE_URL_PREFIX = getattr(
+    settings,
+    "PROCREG_SENDFILE_URL_PREFIX",
+    "/protected-media/",
+)
+
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeFile():
+    """Reads at most length bytes of f, from its current position."""
+
+    def __init__(self, f, length):
+        self.f = f
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.f.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.f.close()
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """Return the (start, end) of a single byte range, end inclusive.
+    Returns None if there is no range header, or one we don't support,
+    such as multiple ranges. Those are answered with the whole file."""
+    match = RANGE.match(header or "")
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start:
+        if not end:
+            return None
+        # The last end bytes
+        start = max(size - int(end), 0)
+        end = size - 1
+    else:
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+    if start > end:
+        raise RangeNotSatisfiable
+    return start, end
+
+
+def get_etag(attachment, size, modified):
+    if attachment.sha256:
+        return f'"{attachment.sha256}"'
+    return f'"{int(modified.timestamp())}-{size}"'
+
+
+def range_applies(request, etag, modified):
+    """If-Range only lets the range through if the file is unchanged."""
+    if_range = request.headers.get("If-Range")
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    since = parse_http_date_safe(if_range)
+    return since is not None and int(modified.timestamp()) <= since
+
+
+def serve_attachment(request, attachment):
+    storage = attachment.upload.storage
+    name = attachment.upload.name
+    size = storage.size(name)
+    modified = storage.get_modified_time(name)
+    etag = get_etag(attachment, size, modified)
+    filename = attachment.get_filename()
+
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(modified.timestamp()),
+    )
+    if response is None:
+        if SENDFILE_BACKEND:
+            response = sendfile_response(storage, name)
+        else:
+            response = file_response(request, storage, name, size, etag,
+                                     modified)
+        content_type, _ = mimetypes.guess_type(filename)
+        response["Content-Type"] = content_type or "application/octet-stream"
+        response["Content-Disposition"] = content_disposition_header(
+            as_attachment=True,
+            filename=filename,
+        )
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(modified.timestamp())
+    # Access checked downloads must not end up in shared caches
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def sendfile_response(storage, name):
+    """Leave sending the file to the web server. It also takes care of
+    byte ranges."""
+    response = HttpResponse()
+    if SENDFILE_BACKEND == "nginx":
+        response["X-Accel-Redirect"] = SENDFILE_URL_PREFIX + quote(name)
+    else:
+        response["X-Sendfile"] = storage.path(name)
+    return response
+
+
+def file_response(request, storage, name, size, etag, modified):
+    byte_range = None
+    if request.method == "GET" and range_applies(request, etag, modified):
+        try:
+            byte_range = parse_range(request.headers.get("Range"), size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+    f = storage.open(name, "rb")
+    if byte_range is None:
+        response = FileResponse(f)
+        response["Content-Length"] = size
+    else:
+        start, end = byte_range
+        f.seek(start)
+        response = FileResponse(RangeFile(f, end - start + 1), status=206)
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = end - start + 1
+    response["Accept-Ranges"] = "bytes"
+    return response
@@ -0,0 +1,200 @@
+"""
+Export of registrations to CSV and XLSX, for privacy officers (PO).
+
+Registrations are read from the database in chunks, each with its own
+batch of prefetch queries, and turned into rows one at a time. CSV is
+streamed to the client as it is generated. XLSX requires openpyxl,
+which writes rows to a temporary file in write-only mode. Either way
+memory use doesn't grow with the number of registrations.
+"""
+import csv
+import re
+import tempfile
+
+from django.db.models import Prefetch
+from django.http import FileResponse, StreamingHttpResponse
+
+from .models import Registration, Involved
+
+try:
+    import openpyxl
+except ImportError:
+    # XLSX export is not available
+    openpyxl = None
+
+
+EXPORT_CHUNK_SIZE = 500
+
+# Characters spreadsheet programs read as the start of a formula
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+# Control characters that can't be stored in XLSX files
+ILLEGAL_XLSX_CHARACTERS = re.compile(r"[\000-\010]|[\013-\014]|[\016-\037]")
+
+
+class RegistrationExport():
+    """Turns a Registration queryset into rows, one per registration.
+    Sub-objects are summarized in a single column each."""
+
+    # Registration fields to export, in order
+    fields = [
+        "id",
+        "registration_title",
+        "status",
+        "created_on",
+        "faculty",
+        "date_start",
+        "date_end",
+        "research_goal",
+        "involves_knowingly",
+        "involves_not_knowingly",
+        "involves_guardian",
+        "involves_other",
+        "raw_storage_location",
+        "raw_data_decade",
+        "ic_storage_location",
+        "ic_storage_decade",
+        "audio_video_kept",
+        "audio_video_kept_details",
+        "data_storage",
+        "consent_document_storage",
+        "multimedia_storage",
+        "third_party_sharing",
+        "uses_software",
+        "follows_policy",
+        "policy_exceptions",
+        "policy_additions",
+        "submitter_comments",
+    ]
+    related_columns = [
+        "created_by",
+        "applicants",
+        "involved_groups",
+        "receivers",
+        "software",
+    ]
+
+    def __init__(self, queryset, chunk_size=EXPORT_CHUNK_SIZE):
+        self.queryset = queryset
+        self.chunk_size = chunk_size
+        self.detail_fields = [
+            field.name for field in Involved._meta.many_to_many
+        ]
+
+    def get_queryset(self):
+        return self.queryset.select_related(
+            "created_by",
+        ).prefetch_related(
+            "applicants",
+            Prefetch(
+                "involved_groups",
+                queryset=Involved.objects.order_by("pk").prefetch_related(
+                    *self.detail_fields,
+                ),
+            ),
+            "receivers",
+            "software",
+        )
+
+    def get_header(self):
+        return self.fields + self.related_columns
+
+    def format_user(self, user):
+        if user is None:
+            return ""
+        return user.get_full_name() or user.username
+
+    def format_involved(self, involved):
+        details = []
+        for name in self.detail_fields:
+            values = [d.name for d in getattr(involved, name).all()]
+            if values:
+                details.append(f"{name}: {', '.join(values)}")
+        text = f"{involved.name} ({involved.group_type})"
+        if details:
+            text += " - " + "; ".join(details)
+        return text
+
+    def get_row(self, registration):
+        row = [getattr(registration, field) for field in self.fields]
+        row += [
+            self.format_user(registration.created_by),
+            ", ".join(
+                self.format_user(user)
+                for user in registration.applicants.all()
+            ),
+            " | ".join(
+                self.format_involved(involved)
+                for involved in registration.involved_groups.all()
+            ),
+            ", ".join(r.name for r in registration.receivers.all()),
+            ", ".join(s.name for s in registration.software.all()),
+        ]
+        return [self.format_value(value) for value in row]
+
+    def format_value(self, value):
+        if value is None:
+            return ""
+        if hasattr(value, "isoformat"):
+            return value.isoformat()
+        value = str(value)
+        if value.startswith(FORMULA_PREFIXES):
+            # Keep spreadsheet programs from running it
+            value = "'" + value
+        return value
+
+    def rows(self):
+        yield self.get_header()
+        registrations = self.get_queryset().iterator(
+            chunk_size=self.chunk_size,
+        )
+        for registration in registrations:
+            yield self.get_row(registration)
+
+
+class Echo():
+    """File-like object that returns what is written to it, so that
+    csv.writer output can be streamed."""
+
+    def write(self, value):
+        return value
+
+
+def xlsx_available():
+    """openpyxl is an optional dependency, in requirements.txt. Without
+    it only CSV is offered."""
+    return openpyxl is not None
+
+
+def csv_response(export, filename):
+    writer = csv.writer(Echo())
+    response = StreamingHttpResponse(
+        (writer.writerow(row) for row in export.rows()),
+        content_type="text/csv; charset=utf-8",
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+def xlsx_response(export, filename):
+    """XLSX is a zip archive, which can't be sent before it is complete.
+    openpyxl writes the rows to a temporary file as they come, and the
+    archive goes to another one, which FileResponse sends in blocks."""
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet("Registrations")
+    for row in export.rows():
+        sheet.append(
+            [ILLEGAL_XLSX_CHARACTERS.sub("", value) for value in row]
+        )
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=f"{filename}.xlsx",
+        content_type=(
+            "application/vnd.openxmlformats-officedocument."
+            "spreadsheetml.sheet"
+        ),
+    )
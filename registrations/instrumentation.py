@@ -0,0 +1,282 @@
+"""
+Measurements of the consumer chain.
+
+Every run of RegistrationBlueprint.run_consumers is profiled: for each
+consumer the wall time, the number of queries and the number of
+questions it appended, plus the totals for the run. A profile is
+
+- logged to the registrations.instrumentation logger, as a warning
+  when it took longer than PROCREG_SLOW_BLUEPRINT_MS,
+- added to the Server-Timing header of the response in debug mode,
+  see ServerTimingMiddleware,
+- added to the recent samples shown on the blueprint statistics page.
+  Samples are kept in memory, so every process has its own.
+
+Set PROCREG_INSTRUMENT_BLUEPRINTS to False to turn profiling off.
+"""
+import collections
+import contextvars
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+ENABLED = getattr(settings, "PROCREG_INSTRUMENT_BLUEPRINTS", True)
+SLOW_BLUEPRINT_MS = getattr(settings, "PROCREG_SLOW_BLUEPRINT_MS", 500)
+# Number of recent samples kept per consumer
+MAX_SAMPLES = getattr(settings, "PROCREG_BLUEPRINT_STATS_SAMPLES", 1000)
+
+# Name under which the totals of whole runs are kept
+TOTAL = "total"
+
+# Profiles made while handling the current request, if collected
+request_profiles = contextvars.ContextVar("request_profiles", default=None)
+
+
+class QueryCounter():
+    """Database execute wrapper counting the queries it sees."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class ConsumerTiming():
+
+    def __init__(self, name, ms, queries, questions):
+        self.name = name
+        self.ms = ms
+        self.queries = queries
+        self.questions = questions
+
+    def to_dict(self):
+        return {
+            "consumer": self.name,
+            "ms": round(self.ms, 3),
+            "queries": self.queries,
+            "questions": self.questions,
+        }
+
+
+class BlueprintProfile():
+    """Measurements of a single run of the consumer chain."""
+
+    def __init__(self, blueprint, kind):
+        self.blueprint = blueprint
+        self.kind = kind
+        self.timings = []
+        self.queries = QueryCounter()
+        self.started = None
+        self.ms = 0
+
+    @contextmanager
+    def run(self):
+        self.started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(self.queries):
+                yield self
+        finally:
+            # Also when a consumer raised, up to where it did
+            self.ms = (time.perf_counter() - self.started) * 1000
+            self.finish()
+
+    @contextmanager
+    def measure(self, consumer):
+        # Consumers are queued as classes, or as instances bound to
+        # an involved group
+        if not isinstance(consumer, type):
+            consumer = type(consumer)
+        start = time.perf_counter()
+        queries = self.queries.count
+        questions = len(self.blueprint.questions)
+        try:
+            yield
+        finally:
+            self.timings.append(
+                ConsumerTiming(
+                    consumer.__name__,
+                    (time.perf_counter() - start) * 1000,
+                    self.queries.count - queries,
+                    len(self.blueprint.questions) - questions,
+                )
+            )
+
+    @property
+    def question_count(self):
+        return sum(timing.questions for timing in self.timings)
+
+    def to_dict(self):
+        return {
+            "registration": self.blueprint.object.pk,
+            "kind": self.kind,
+            "ms": round(self.ms, 3),
+            "queries": self.queries.count,
+            "questions": self.question_count,
+            "consumers": [timing.to_dict() for timing in self.timings],
+        }
+
+    def finish(self):
+        level = logging.DEBUG
+        if self.ms > SLOW_BLUEPRINT_MS:
+            level = logging.WARNING
+        if logger.isEnabledFor(level):
+            logger.log(
+                level,
+                "Blueprint %s of registration %s: %.1f ms, %s queries, "
+                "%s consumers",
+                self.kind,
+                self.blueprint.object.pk,
+                self.ms,
+                self.queries.count,
+                len(self.timings),
+                extra={"blueprint_profile": self.to_dict()},
+            )
+        STATS.add(self)
+        profiles = request_profiles.get()
+        if profiles is not None:
+            profiles.append(self)
+
+
+@contextmanager
+def profile_consumers(blueprint, kind):
+    """Profile a run of consumers, or do nothing if instrumentation
+    is disabled."""
+    if not ENABLED:
+        yield None
+        return
+    profile = BlueprintProfile(blueprint, kind)
+    with profile.run():
+        yield profile
+
+
+class Samples():
+
+    def __init__(self, size):
+        self.ms = collections.deque(maxlen=size)
+        self.queries = collections.deque(maxlen=size)
+        self.questions = collections.deque(maxlen=size)
+
+    def add(self, ms, queries, questions):
+        self.ms.append(ms)
+        self.queries.append(queries)
+        self.questions.append(questions)
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of values."""
+    if not values:
+        return None
+    values = sorted(values)
+    index = max(math.ceil(fraction * len(values)) - 1, 0)
+    return values[index]
+
+
+class BlueprintStats():
+    """Recent samples per consumer class, and of whole runs."""
+
+    def __init__(self, size=MAX_SAMPLES):
+        self.size = size
+        self.samples = {}
+        self.lock = threading.Lock()
+
+    def get_samples(self, name):
+        if name not in self.samples:
+            self.samples[name] = Samples(self.size)
+        return self.samples[name]
+
+    def add(self, profile):
+        with self.lock:
+            self.get_samples(TOTAL).add(
+                profile.ms,
+                profile.queries.count,
+                profile.question_count,
+            )
+            for timing in profile.timings:
+                self.get_samples(timing.name).add(
+                    timing.ms,
+                    timing.queries,
+                    timing.questions,
+                )
+
+    def clear(self):
+        with self.lock:
+            self.samples = {}
+
+    def summary(self):
+        """Return a row per consumer, slowest p95 first, with the
+        totals of whole runs first of all."""
+        with self.lock:
+            samples = {
+                name: (list(s.ms), list(s.queries), list(s.questions))
+                for name, s in self.samples.items()
+            }
+        rows = []
+        for name, (ms, queries, questions) in samples.items():
+            rows.append(
+                {
+                    "name": name,
+                    "count": len(ms),
+                    "p50_ms": percentile(ms, 0.5),
+                    "p95_ms": percentile(ms, 0.95),
+                    "p50_queries": percentile(queries, 0.5),
+                    "p95_queries": percentile(queries, 0.95),
+                    "mean_questions": sum(questions) / len(questions),
+                }
+            )
+        rows.sort(key=lambda row: (row["name"] != TOTAL, -row["p95_ms"]))
+        return rows
+
+
+STATS = BlueprintStats()
+
+
+class ServerTimingMiddleware():
+    """In debug mode, add the time spent in the consumer chain to the
+    Server-Timing header, so that it shows in the browser's developer
+    tools."""
+
+    # Consumers beyond these are left out of the header
+    max_consumers = 10
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not (settings.DEBUG and ENABLED):
+            return self.get_response(request)
+        token = request_profiles.set([])
+        try:
+            response = self.get_response(request)
+            profiles = request_profiles.get()
+        finally:
+            request_profiles.reset(token)
+        if profiles:
+            header = self.get_header(profiles)
+            if response.has_header("Server-Timing"):
+                header = response["Server-Timing"] + ", " + header
+            response["Server-Timing"] = header
+        return response
+
+    def get_header(self, profiles):
+        consumers = collections.Counter()
+        for profile in profiles:
+            for timing in profile.timings:
+                consumers[timing.name] += timing.ms
+        total = sum(profile.ms for profile in profiles)
+        queries = sum(profile.queries.count for profile in profiles)
+        metrics = [
+            f'blueprint;dur={total:.1f};desc="{len(profiles)} runs, '
+            f'{queries} queries"',
+        ]
+        for name, ms in consumers.most_common(self.max_consumers):
+            metrics.append(f"{name};dur={ms:.1f}")
+        return ", ".join(metrics)
@@ -0,0 +1,79 @@
+import json
+import subprocess
+
+import django
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from registrations.benchmarks import BlueprintBenchmark, SIZES
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure queries, wall time and peak memory of blueprint "
+        "construction and the main registration views, using synthetic "
+        "registrations that are rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--size",
+            action="append",
+            choices=list(SIZES.keys()),
+            dest="sizes",
+            help="Fixture size to run, may be repeated. Default: all",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=3,
+            help="Number of runs per scenario",
+        )
+        parser.add_argument(
+            "--output",
+            default=None,
+            help="Write JSON results to this file instead of stdout",
+        )
+        parser.add_argument(
+            "--label",
+            default="",
+            help="Free-form label stored with the results",
+        )
+
+    def get_commit(self):
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "HEAD"],
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def handle(self, *args, **options):
+        benchmark = BlueprintBenchmark(
+            sizes=options["sizes"],
+            repeat=options["repeat"],
+        )
+        results = benchmark.run()
+        report = {
+            "label": options["label"],
+            "commit": self.get_commit(),
+            "created": timezone.now().isoformat(),
+            "django": django.get_version(),
+            "results": results,
+        }
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output)
+            for result in results:
+                self.stdout.write(
+                    "{size:>8} {scenario:<20} {queries:>6} queries "
+                    "{time_ms_median:>10} ms {peak_memory_kib:>10} KiB".format(
+                        **result
+                    )
+                )
+        else:
+            self.stdout.write(output)
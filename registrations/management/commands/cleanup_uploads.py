@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from registrations.storage import remove_unreferenced_blobs
+from registrations.uploads import remove_expired_uploads
+
+
+class Command(BaseCommand):
+    help = (
+        "Remove chunked attachment uploads that were never finished, "
+        "along with their temporary files, and attachment files no "
+        "attachment refers to anymore. Meant to be run periodically."
+    )
+
+    def handle(self, *args, **options):
+        count = remove_expired_uploads()
+        self.stdout.write(f"Removed {count} expired uploads")
+        count = remove_unreferenced_blobs()
+        self.stdout.write(f"Removed {count} unreferenced attachment files")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from registrations.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the full-text search documents of all registrations. "
+        "Run after changing registrations without signals, such as "
+        "with bulk_create."
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = rebuild_search_index()
+        self.stdout.write(f"Indexed {count} registrations")
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.6 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registrations', '0034_alter_registration_registration_title'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registration',
+            name='revision',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.6 on 2026-10-18 09:12
+
+from django.db import migrations, models
+from django.db.utils import OperationalError
+import django.db.models.deletion
+
+
+FTS_TABLE = 'registrations_search_fts'
+FULLTEXT_INDEX = 'registrations_search_document_ft'
+
+
+def create_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                "USING fts5(title, document, "
+                "tokenize='unicode61 remove_diacritics 2')"
+            )
+        except OperationalError:
+            # SQLite was built without FTS5, searching falls back to
+            # matching the search document column
+            pass
+    elif vendor == 'mysql':
+        schema_editor.execute(
+            f"CREATE FULLTEXT INDEX {FULLTEXT_INDEX} ON "
+            "registrations_registrationsearchdocument (document)"
+        )
+
+
+def drop_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif vendor == 'mysql':
+        schema_editor.execute(
+            f"DROP INDEX {FULLTEXT_INDEX} ON "
+            "registrations_registrationsearchdocument"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registrations', '0035_registration_revision'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistrationSearchDocument',
+            fields=[
+                ('registration', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='registrations.registration')),
+                ('title', models.CharField(blank=True, default='', max_length=200)),
+                ('document', models.TextField(blank=True, default='')),
+            ],
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.6 on 2026-10-18 09:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('registrations', '0036_registrationsearchdocument'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registration',
+            name='favourited_by',
+            field=models.ManyToManyField(blank=True, related_name='favourite_registrations', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='registration',
+            index=models.Index(fields=['created_by', 'status', 'created_on'], name='registration_creator_status'),
+        ),
+    ]
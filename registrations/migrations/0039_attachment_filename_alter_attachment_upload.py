@@ -0,0 +1,35 @@
+# Generated by Django 4.2.6 on 2026-10-18 09:12
+
+import os
+
+from django.db import migrations, models
+import registrations.storage
+
+
+def set_filenames(apps, schema_editor):
+    Attachment = apps.get_model("registrations", "Attachment")
+    attachments = Attachment.objects.filter(filename="")
+    for attachment in attachments.iterator():
+        attachment.filename = os.path.basename(attachment.upload.name)
+        attachment.save(update_fields=["filename"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registrations', '0038_attachment_sha256_attachmentupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attachment',
+            name='filename',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='attachment',
+            name='upload',
+            field=models.FileField(db_index=True, max_length=255, storage=registrations.storage.ContentAddressedStorage(), upload_to=registrations.storage.attachment_upload_to),
+        ),
+        migrations.RunPython(set_filenames, migrations.RunPython.noop),
+    ]
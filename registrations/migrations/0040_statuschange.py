@@ -0,0 +1,27 @@
+# Generated by Django 4.2.6 on 2026-10-18 09:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('registrations', '0039_attachment_filename_alter_attachment_upload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatusChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('old_status', models.CharField(choices=[('draft', 'models:registration:status_draft'), ('submitted', 'models:registration:status_submitted'), ('registered', 'models:registration:status_registered')], max_length=20)),
+                ('new_status', models.CharField(choices=[('draft', 'models:registration:status_draft'), ('submitted', 'models:registration:status_submitted'), ('registered', 'models:registration:status_registered')], max_length=20)),
+                ('changed_on', models.DateTimeField(auto_now_add=True)),
+                ('changed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='status_changes', to=settings.AUTH_USER_MODEL)),
+                ('registration', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_changes', to='registrations.registration')),
+            ],
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.6 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registrations', '0040_statuschange'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='registration',
+            index=models.Index(fields=['created_on'], name='registration_created_on'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.6 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registrations', '0041_registration_registration_created_on'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='registration',
+            name='created_on',
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.6 on 2026-10-18 09:12
+
+from django.db import migrations
+
+from registrations.search import get_search_text
+
+FTS_TABLE = 'registrations_search_fts'
+BATCH_SIZE = 500
+
+
+def build_search_documents(apps, schema_editor):
+    """Search documents are only built when registrations change, so
+    build them for the registrations that existed before."""
+    Registration = apps.get_model("registrations", "Registration")
+    RegistrationSearchDocument = apps.get_model(
+        "registrations", "RegistrationSearchDocument",
+    )
+    connection = schema_editor.connection
+    use_fts = (
+        connection.vendor == 'sqlite' and
+        FTS_TABLE in connection.introspection.table_names()
+    )
+    registrations = Registration.objects.filter(
+        search_document__isnull=True,
+    ).select_related(
+        "created_by",
+    ).prefetch_related(
+        "applicants",
+        "involved_groups",
+        "receivers",
+        "software",
+    ).order_by("pk")
+    documents = []
+    for registration in registrations.iterator(chunk_size=BATCH_SIZE):
+        title, document = get_search_text(registration)
+        documents.append(
+            RegistrationSearchDocument(
+                registration_id=registration.pk,
+                title=title,
+                document=document,
+            )
+        )
+        if use_fts:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"INSERT INTO {FTS_TABLE} (rowid, title, document) "
+                    "VALUES (%s, %s, %s)",
+                    [registration.pk, title, document],
+                )
+        if len(documents) >= BATCH_SIZE:
+            RegistrationSearchDocument.objects.bulk_create(documents)
+            documents = []
+    RegistrationSearchDocument.objects.bulk_create(documents)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registrations', '0042_alter_registration_created_on'),
+    ]
+
+    operations = [
+        migrations.RunPython(build_search_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.6 on 2026-10-18 09:12
+
+from django.db import migrations, transaction
+
+from registrations.storage import BLOB_DIR, attachment_storage, \
+    get_blob_name, hash_file
+
+
+def store_attachments_by_hash(apps, schema_editor):
+    """Attachment files stored before were saved under their own name.
+    Store them under their hash like new ones, so that they are shared
+    and removed when no longer used."""
+    Attachment = apps.get_model("registrations", "Attachment")
+    legacy = Attachment.objects.exclude(
+        upload__startswith=f"{BLOB_DIR}/",
+    ).exclude(upload="")
+    moved = set()
+    for attachment in legacy.iterator():
+        name = attachment.upload.name
+        if not attachment_storage.exists(name):
+            # Missing files keep their name, release_blob ignores them
+            continue
+        with attachment_storage.open(name) as f:
+            digest = hash_file(f)
+            blob_name = attachment_storage.save(
+                get_blob_name(digest, name),
+                f,
+            )
+        Attachment.objects.filter(pk=attachment.pk).update(
+            upload=blob_name,
+            sha256=digest,
+        )
+        moved.add(name)
+
+    def remove_moved():
+        for name in moved:
+            attachment_storage.delete(name)
+
+    # Only once no attachment refers to the old names for certain
+    transaction.on_commit(remove_moved)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registrations', '0043_build_search_documents'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            store_attachments_by_hash,
+            migrations.RunPython.noop,
+        ),
+    ]
@@ -1,5 +1,9 @@
 from django.core.exceptions import PermissionDenied
+from django.shortcuts import get_object_or_404
 from cdh.questions.views import BlueprintMixin
+from main.utils import get_group_names
+from .models import Registration
+from .permissions import is_involved
 from .blueprints import RegistrationBlueprint
 
 
@@ -25,6 +29,11 @@ class UsersOrGroupsAllowedMixin():
         """Given a user object, return True if they are allowed"""
         return False
 
+    def is_allowed_user(self, user):
+        """Return True if user is one of the allowed users. Can be
+        overwritten with a cheaper check than listing them all."""
+        return user in set(self.get_allowed_users())
+
     def check_membership(self, groups):
         """ Check required group(s) """
         # We do a superuser check here because this method
@@ -36,7 +45,7 @@ class UsersOrGroupsAllowedMixin():
     def dispatch(self, request, *args, **kwargs):
         authorized = False
         self.current_user = request.user
-        self.current_user_groups = set(self.current_user.groups.values_list("name", flat=True))
+        self.current_user_groups = get_group_names(self.current_user)
 
         # Default allowed groups and users
         try: group_required = self.group_required
@@ -47,14 +56,14 @@ class UsersOrGroupsAllowedMixin():
         except AttributeError:
             self.allowed_users = None
 
-        if self.current_user.is_authenticated:
-            if self.current_user in self.get_allowed_users():
-                authorized = True
-            elif self.check_membership(self.get_group_required()):
-                authorized = True
-
+        # Cheapest checks first
         if self.allowed_user_test(self.current_user):
             authorized = True
+        elif self.current_user.is_authenticated:
+            if self.check_membership(self.get_group_required()):
+                authorized = True
+            elif self.is_allowed_user(self.current_user):
+                authorized = True
 
         if not authorized:
             raise PermissionDenied
@@ -63,6 +72,39 @@ class UsersOrGroupsAllowedMixin():
             request, *args, **kwargs)
 
 
+class RegistrationAccessMixin(
+        UsersOrGroupsAllowedMixin,
+):
+    """Allow the creator and applicants of the registration in the
+    reg_pk kwarg, as well as staff. The registration is loaded first,
+    so that one that doesn't exist is not found rather than forbidden.
+    Access is decided before any blueprint is built, with at most one
+    more query for applicants."""
+
+    registration_pk_kwarg = "reg_pk"
+    registration = None
+
+    def get_registration(self):
+        """The registration is fetched once per request."""
+        if self.registration is None:
+            self.registration = get_object_or_404(
+                Registration,
+                pk=self.kwargs.get(self.registration_pk_kwarg),
+            )
+        return self.registration
+
+    def dispatch(self, request, *args, **kwargs):
+        self.get_registration()
+        return super().dispatch(request, *args, **kwargs)
+
+    def allowed_user_test(self, user):
+        return user.is_staff
+
+    def is_allowed_user(self, user):
+        registration = self.get_registration()
+        if registration.created_by_id == user.pk:
+            return True
+        return is_involved(user, registration.pk)
 
 
 class QuestionFromBlueprintMixin(
@@ -80,8 +122,11 @@ class QuestionFromBlueprintMixin(
 
     def get_question(self, extra_filter=None):
         """Use the provided kwarg to get the instatiated question
-        from our blueprint."""
+        from our blueprint. The question is looked up once per
+        blueprint, the view asks for it many times."""
         blueprint = self.get_blueprint()
+        if getattr(self, "_question_blueprint", None) is blueprint:
+            return self._question
         slug = self.kwargs.get(self.question_class_kwarg)
         question_pk = self.get_question_pk()
         search = blueprint.get_question(
@@ -99,8 +144,9 @@ class QuestionFromBlueprintMixin(
                 f"""Got multiple possible questions for given query: 
                 {slug} with pk {question_pk} ({search})""",
             )
-        else:
-            return search
+        self._question = search
+        self._question_blueprint = blueprint
+        return search
 
     def get_object(self,):
         """Using this mixin, the questions provided by the
@@ -152,26 +198,23 @@ class GroupTypeMixin():
 class RegistrationMixin(
         GroupTypeMixin,
         BlueprintMixin,
-        UsersOrGroupsAllowedMixin,
+        RegistrationAccessMixin,
 ):
 
     blueprint_class = RegistrationBlueprint
     blueprint_pk_kwarg = "reg_pk"
-    registration = None
 
-    """Allow the owner of a registration to access and edit it.
-    In the future, this will include collaborators."""
+    """Allow the owner of a registration and its applicants to access
+    and edit it."""
 
-    def get_registration(self):
-        return self.get_blueprint_object()
+    def get_blueprint_object(self):
+        """The registration is shared with the blueprint."""
+        return self.get_registration()
 
-    def allowed_user_test(self, user):
-        return user.is_staff
-
-    def get_allowed_users(self):
-        allowed = [self.get_registration().created_by]
-        allowed.append(super().get_allowed_users())
-        return allowed
+    def get_blueprint(self):
+        if self.blueprint is None:
+            self.blueprint = super().get_blueprint()
+        return self.blueprint
 
     def get_context_data(self, *args, **kwargs):
         context = super().get_context_data(*args, **kwargs)
@@ -182,4 +225,19 @@ class RegistrationQuestionMixin(
         RegistrationMixin,
         QuestionFromBlueprintMixin,
 ):
-    pass
+
+    def refresh_blueprint(self):
+        """After saving, re-run the part of the blueprint that depends
+        on the saved answer. The desired next question might have
+        changed because of it."""
+        blueprint = self.get_blueprint()
+        slug = self.kwargs.get(self.question_class_kwarg)
+        if not blueprint.reevaluate(slug, self.object):
+            # Saving sub-objects bumps the revision in the database
+            self.get_registration().forget_revision()
+            self.blueprint = None
+            self.blueprint = self.get_blueprint()
+        # Re-evaluating replaced the questions, also when it did so in
+        # the same blueprint
+        self._question_blueprint = None
+        return self.blueprint
@@ -1,5 +1,7 @@
 from .registration import Registration
 from .involved import Involved
-from .minor_models import Receiver, ParticipantCategory, Software, Attachment
+from .minor_models import Receiver, ParticipantCategory, Software, Attachment, \
+    AttachmentUpload, StatusChange
 from .details import SpecialDetail
 from .faq import Faq, FaqList
+from .search import RegistrationSearchDocument
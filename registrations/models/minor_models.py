@@ -1,7 +1,11 @@
+import os
+import uuid
+
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.utils.translation import gettext as _
 from .registration import YES_NO, YES_NO_NA, Registration
+from ..storage import attachment_storage, attachment_upload_to, hash_file
 
 # Create your models here.
 
@@ -69,7 +73,27 @@ class Attachment(models.Model):
         blank=True,
         default=""
     )
+    # Files are stored once under their hash and shared between
+    # attachments, see registrations.storage
     upload = models.FileField(
+        upload_to=attachment_upload_to,
+        storage=attachment_storage,
+        max_length=255,
+        db_index=True,
+    )
+    # Name of the file as uploaded
+    filename = models.CharField(
+        max_length=255,
+        blank=True,
+        default="",
+    )
+    # Hex SHA-256 digest of the uploaded file, computed while
+    # receiving it, see registrations.uploads
+    sha256 = models.CharField(
+        max_length=64,
+        blank=True,
+        default="",
+        editable=False,
     )
     registration = models.ForeignKey(
         Registration,
@@ -77,6 +101,57 @@ class Attachment(models.Model):
         on_delete=models.CASCADE,
     )
 
+    def save(self, *args, **kwargs):
+        if self.upload and not self.upload._committed:
+            # A new file, which is stored under its hash
+            self.filename = os.path.basename(self.upload.name)
+            self.sha256 = hash_file(self.upload)
+        return super().save(*args, **kwargs)
+
+    def get_filename(self):
+        return self.filename or os.path.basename(self.upload.name)
+
+
+class AttachmentUpload(models.Model):
+    """An attachment that is being uploaded in chunks. The Attachment
+    itself is only created once all bytes have been received."""
+
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False,
+    )
+    registration = models.ForeignKey(
+        Registration,
+        related_name="attachment_uploads",
+        on_delete=models.CASCADE,
+    )
+    created_by = models.ForeignKey(
+        USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="attachment_uploads",
+    )
+    filename = models.CharField(
+        max_length=255,
+    )
+    file_description = models.CharField(
+        max_length=500,
+        blank=True,
+        default="",
+    )
+    # Total size in bytes, and the number of bytes received so far
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(
+        default=0,
+    )
+    created_on = models.DateTimeField(
+        auto_now_add=True,
+    )
+    updated_on = models.DateTimeField(
+        auto_now=True,
+    )
+
+
 class ParticipantCategory(models.Model):
 
     name = models.CharField(max_length=100,
@@ -90,3 +165,32 @@ class ParticipantCategory(models.Model):
     registration = models.ForeignKey(Registration,
                                      on_delete=models.CASCADE,
                                      )
+
+
+class StatusChange(models.Model):
+    """A change of the status of a registration by a privacy officer,
+    see registrations.transitions."""
+
+    registration = models.ForeignKey(
+        Registration,
+        related_name="status_changes",
+        on_delete=models.CASCADE,
+    )
+    old_status = models.CharField(
+        max_length=20,
+        choices=Registration.STATUSES,
+    )
+    new_status = models.CharField(
+        max_length=20,
+        choices=Registration.STATUSES,
+    )
+    changed_by = models.ForeignKey(
+        USER_MODEL,
+        on_delete=models.SET_NULL,
+        related_name="status_changes",
+        blank=True,
+        null=True,
+    )
+    changed_on = models.DateTimeField(
+        auto_now_add=True,
+    )
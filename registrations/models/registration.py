@@ -33,7 +33,7 @@ class Registration(models.Model):
                                    null=True,
                                    default=None,
                                    )
-    created_on = models.DateTimeField(auto_now=True)
+    created_on = models.DateTimeField(auto_now_add=True)
     STATUSES = (
         ("draft", "models:registration:status_draft"),
         ("submitted", "models:registration:status_submitted"),
@@ -44,6 +44,19 @@ class Registration(models.Model):
         choices=STATUSES,
         default="draft",
     )
+    # Goes up on every change to this registration or its sub-objects,
+    # see registrations.signals. Cached progress bars are keyed on it.
+    revision = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+    )
+
+    # Users who marked this registration as a favourite
+    favourited_by = models.ManyToManyField(
+        USER_MODEL,
+        related_name="favourite_registrations",
+        blank=True,
+    )
 
     # Blueprint information
     applicants = models.ManyToManyField(USER_MODEL,
@@ -188,6 +201,24 @@ class Registration(models.Model):
         blank=True,
     )
 
+    class Meta:
+        indexes = [
+            # Personal registration lists, filtered by status
+            # and ordered by date
+            models.Index(
+                fields=["created_by", "status", "created_on"],
+                name="registration_creator_status",
+            ),
+            # The PO list and the admin, newest first
+            models.Index(
+                fields=["created_on"],
+                name="registration_created_on",
+            ),
+        ]
+
+    def __str__(self):
+        return self.registration_title
+
     def list_involved_types(self):
         """
         Return a list of involved group types involved in this registration.
@@ -204,3 +235,39 @@ class Registration(models.Model):
             group_dict.keys(),
         )
         return [group_dict[t] for t in involved]
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            return super().save(*args, **kwargs)
+        # Every save bumps the revision in its own UPDATE. The value in
+        # memory may be stale, so it is never written itself.
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None:
+            update_fields = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key
+            ]
+        kwargs["update_fields"] = [
+            *(name for name in update_fields if name != "revision"),
+            "revision",
+        ]
+        self.revision = models.F("revision") + 1
+        try:
+            return super().save(*args, **kwargs)
+        finally:
+            self.forget_revision()
+
+    def forget_revision(self):
+        """Load the revision from the database again when it is next
+        used, because it was changed there."""
+        self.__dict__.pop("revision", None)
+
+    def bump_revision(self):
+        """
+        Increment the revision counter, marking everything derived from
+        the current state of this registration as outdated.
+        """
+        Registration.objects.filter(pk=self.pk).update(
+            revision=models.F("revision") + 1,
+        )
+        self.forget_revision()
@@ -0,0 +1,25 @@
+from django.db import models
+
+from .registration import Registration
+
+
+class RegistrationSearchDocument(models.Model):
+    """Normalized text of a registration and its sub-objects, kept
+    up to date by registrations.signals. See registrations.search."""
+
+    registration = models.OneToOneField(
+        Registration,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="search_document",
+    )
+    # Normalized registration title, title matches rank higher
+    title = models.CharField(
+        max_length=200,
+        default="",
+        blank=True,
+    )
+    document = models.TextField(
+        default="",
+        blank=True,
+    )
@@ -0,0 +1,39 @@
+"""
+Who may see and edit a registration.
+
+A registration is accessible to its creator and to the applicants
+added to it as collaborators. Access is checked with a single query on
+indexed columns, so that views can refuse a request before building
+the blueprint of the registration. Staff and groups are checked by the
+views themselves, see registrations.mixins.
+"""
+from django.db.models import Exists, OuterRef, Q
+
+from .models import Registration
+
+Applicants = Registration.applicants.through
+
+
+def involved_in_registration(user):
+    """Filter matching registrations user created or is an applicant
+    for."""
+    return Q(created_by=user) | Exists(
+        Applicants.objects.filter(
+            registration_id=OuterRef("pk"),
+            user_id=user.pk,
+        )
+    )
+
+
+def registrations_for_user(user):
+    if not user.is_authenticated:
+        return Registration.objects.none()
+    return Registration.objects.filter(involved_in_registration(user))
+
+
+def is_involved(user, registration_pk):
+    """Return True if user created the registration with
+    registration_pk, or is one of its applicants."""
+    if not user.is_authenticated or registration_pk is None:
+        return False
+    return registrations_for_user(user).filter(pk=registration_pk).exists()
@@ -1,115 +1,297 @@
-from django.views import View
-from cdh.questions.questions import Question
+from django.conf import settings
+from django.core.cache import cache
+from django.template import loader
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language, gettext_lazy as _
+
+# Progress bars are cached under the registration revision, so outdated
+# entries are never read again. The timeout only serves to clean them up.
+PROGRESS_CACHE_TIMEOUT = getattr(
+    settings,
+    "PROCREG_PROGRESS_CACHE_TIMEOUT",
+    60 * 60 * 24,
+)
 
 
 class ProgressItem:
+    """A single item in the progress bar, reduced to plain data."""
+
+    fields = [
+        "slug",
+        "question_pk",
+        "title",
+        "url",
+        "number",
+        "size",
+        "completed",
+        "incomplete",
+        "disabled",
+        "collapsible",
+        "children_incomplete",
+    ]
 
     def __init__(self):
 
+        self.slug = None
+        self.question_pk = None
         self.title = "Nameless"
-        self.current = False
-        self.completed = False
         self.url = None
+        self.number = ""
+        self.size = "largest"
+        self.completed = False
+        self.incomplete = False
+        self.disabled = False
+        # Collapsible items only show their children while
+        # one of them, or the item itself, is current
+        self.collapsible = False
+        # Show a collapsed item as incomplete
+        self.children_incomplete = False
         self.children = []
 
-    def from_question(question, completed=False, current=False):
+    def from_question(question, **kwargs):
 
         item = ProgressItem()
-        item.title = question.title
+        item.slug = question.slug
+        instance = getattr(question, "instance", None)
+        item.question_pk = getattr(instance, "pk", None)
+        item.title = str(question.title)
         item.url = question.get_edit_url()
-        item.completed = completed
-        item.current = current
+        item.completed = bool(question.complete)
+        item.incomplete = bool(question.incomplete)
+        item.disabled = bool(question.disabled)
+        for key, value in kwargs.items():
+            setattr(item, key, value)
 
         return item
 
-    def css_class(self):
+    def to_dict(self):
+        data = {field: getattr(self, field) for field in self.fields}
+        data["children"] = [child.to_dict() for child in self.children]
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        item = cls()
+        for field in cls.fields:
+            setattr(item, field, data[field])
+        item.children = [cls.from_dict(child) for child in data["children"]]
+        return item
+
+    def is_current(self, slug, question_pk=False):
+        """A question_pk of False matches any instance, None only
+        matches unsaved ones."""
+        if slug != self.slug:
+            return False
+        return question_pk is False or question_pk == self.question_pk
+
+    def is_expanded(self, slug, question_pk=False):
+        if not self.collapsible:
+            return bool(self.children)
+        return self.is_current(slug, question_pk) or any(
+            child.is_current(slug, question_pk) for child in self.children
+        )
+
+    def css_class(self, current=False, expanded=True):
 
         classes = []
-        if self.completed:
-            classes.append("completed")
-        if self.current:
-            classes.append("current")
+        if current:
+            classes.append("active")
+        if self.disabled:
+            classes.append("disabled")
+        elif self.incomplete or (
+                self.children_incomplete and not expanded
+        ):
+            classes.append("incomplete")
+        elif self.completed:
+            classes.append("complete")
 
         return " ".join(classes)
 
+    def render_context(self, slug, question_pk=False):
+        """Return the context to render this item and its children,
+        given the slug and instance pk of the current question."""
+        expanded = self.is_expanded(slug, question_pk)
+        return {
+            "title": self.title,
+            "link": self.url,
+            "number": self.number,
+            "span_classes": f"stepper-bubble stepper-bubble-{self.size}",
+            "item_classes": self.css_class(
+                current=self.is_current(slug, question_pk),
+                expanded=expanded,
+            ),
+            "children": [
+                child.render_context(slug, question_pk)
+                for child in self.children
+            ] if expanded else [],
+        }
 
-class RegistrationProgressBar:
 
-#    all_questions = [
-        #NewRegistrationQuestion,
-        #FacultyQuestion,
-        #TraversalQuestion,
-        #]
+class RegistrationProgressBar:
+    """
+    The progress bar of a registration, built once from a blueprint.
+
+    Only holds plain data, so it is cached per registration revision
+    and language. Which item is current is
+    decided when rendering, see render_context().
+    """
+
+    top_slugs = [
+        "new_reg",
+        "traversal",
+        "goal",
+        "involved_people",
+        "involved_manager",
+        "retention",
+        "receivers",
+        "software",
+        "security",
+        "attachments",
+        "summary",
+    ]
+    involved_slugs = [
+        ("purpose", _("registrations:progress:purpose")),
+        ("special_details", _("registrations:progress:special_details")),
+        ("sensitive_details", _("registrations:progress:sensitive_details")),
+        ("regular_details", _("registrations:progress:regular_details")),
+    ]
+
+    template_name = "registrations/templatetags/progress_bar.html"
 
     def __init__(self, blueprint):
 
         self.blueprint = blueprint
-        self.items = []
-
-    def get_items(self, current=None):
-        item_list = []
-
-        completed = self.blueprint.completed
-        for q in completed:
-            item_list.append(
-                ProgressItem.from_question(
-                    q,
-                    completed=True,
-                    current=(current == q.slug),
-                )
-            )
-        required = self.blueprint.instantiate_question(
-            self.blueprint.required,
+        self._items = None
+
+    @property
+    def items(self):
+        if self._items is None:
+            self._items = self.load()
+            if self._items is None:
+                self._items = self.populate()
+                self.store()
+        return self._items
+
+    def get_cache_key(self, suffix="progress_bar"):
+        registration = self.blueprint.object
+        return "procreg:progress:{}:{}:{}:{}".format(
+            registration.pk,
+            registration.revision,
+            suffix,
+            get_language(),
+        )
+
+    def load(self):
+        data = cache.get(self.get_cache_key())
+        if data is None:
+            return None
+        return [ProgressItem.from_dict(item) for item in data]
+
+    def store(self):
+        cache.set(
+            self.get_cache_key(),
+            [item.to_dict() for item in self._items],
+            PROGRESS_CACHE_TIMEOUT,
         )
-        for q in required:
-            item_list.append(
-                ProgressItem.from_question(
-                    q,
-                    completed=False,
-                    current=(current == q.slug),
-                )
-            )
-        return item_list
 
     def populate(self):
 
-        try:
-            for rq in self.blueprint.required:
-                self.add_question(rq)
-
-            for qq in self.blueprint.questions:
-                self.add_question(qq)
-
-            for ep in self.blueprint.extra_pages:
-                self.add_question(ep)
-
-        except Exception as exc:
-            print(
-                f"""Breaking out of progress bar construction with exception e:
-                {exc}""")
-
-    def ingest(self, item):
-        self.add_item(item)
-
-    def add_item(self, item):
-        if isinstance(item, Question):
-            self.add_question(item)
-        elif isinstance(item, View):
-            self.add_view(item)
-
-    def add_view(self, item):
-        pass
-
-    def add_question(self, question):
-        completed = question.slug in [
-            q.slug for q in self.blueprint.completed
-        ]
-        self.items.append(
-            ProgressItem.from_question(
-                question,
-                completed=completed,
-            ),
+        items = []
+        for number, slug in enumerate(self.top_slugs, start=1):
+            item = self.add_question(slug, number=str(number))
+            if slug == "new_reg":
+                item.collapsible = True
+                item.children_incomplete = bool(
+                    getattr(self.blueprint, "top_questions_incomplete", False)
+                )
+                item.children = [self.add_question("faculty", size="large")]
+            if slug == "involved_manager":
+                item.children = self.get_involved_items()
+            items.append(item)
+        return items
+
+    def get_involved_items(self):
+        items = []
+        registration = self.blueprint.object
+        for group_type in registration.list_involved_types():
+            for involved in self.blueprint.data.get_involved(group_type):
+                item = self.add_question(
+                    "new_involved",
+                    question_pk=involved.pk,
+                    title=involved.name,
+                    size="large",
+                )
+                item.collapsible = True
+                item.children = [
+                    self.add_question(
+                        slug,
+                        question_pk=involved.pk,
+                        title=title,
+                        size="medium",
+                    )
+                    for slug, title in self.involved_slugs
+                ]
+                items.append(item)
+        return items
+
+    def add_question(self, slug, question_pk=False, title=None, **kwargs):
+        """Return a ProgressItem for the blueprint's question with given
+        slug, or a disabled placeholder if there isn't one (yet)."""
+        question = self.blueprint.get_question(
+            slug=slug,
+            question_pk=question_pk,
         )
+        if isinstance(question, list):
+            question = question[0]
+        if question is None:
+            from .questions import QUESTIONS
+            item = ProgressItem()
+            item.slug = slug
+            if not isinstance(question_pk, bool):
+                item.question_pk = question_pk
+            source_question = QUESTIONS.get(slug)
+            item.title = str(getattr(source_question, "title", "Placeholder"))
+            item.disabled = True
+        else:
+            item = ProgressItem.from_question(question)
+        if title:
+            item.title = str(title)
+        for key, value in kwargs.items():
+            setattr(item, key, value)
+        return item
+
+    def get_current(self, current):
+        """Return the slug and instance pk of current, which can be a
+        question, a view or a slug. See ProgressItem.is_current()."""
+        slug = getattr(current, "slug", current)
+        question_pk = False
+        if hasattr(current, "instance"):
+            question_pk = getattr(current.instance, "pk", None)
+        return slug, question_pk
+
+    def render_context(self, current=None):
+        """Return the context for the progress bar template."""
+        slug, question_pk = self.get_current(current)
+        return {
+            "items": [
+                item.render_context(slug, question_pk) for item in self.items
+            ],
+        }
+
+    def render(self, current=None):
+        """Render the progress bar with current highlighted. The HTML is
+        cached per revision, language and current question, so moving
+        between questions doesn't render it again."""
+        slug, question_pk = self.get_current(current)
+        key = self.get_cache_key(f"stepper:{slug}:{question_pk}")
+        html = cache.get(key)
+        if html is None:
+            html = loader.render_to_string(
+                self.template_name,
+                self.render_context(current),
+            )
+            cache.set(key, html, PROGRESS_CACHE_TIMEOUT)
+        return mark_safe(html)
 
 
 class ProgressItemMixin():
@@ -4,6 +4,15 @@ from registrations.models import Registration, Receiver, Attachment
 from django.utils.translation import gettext_lazy as _
 from django.urls import reverse
 from django.template import Template
+from django import forms
+
+
+class ChunkedFileInput(forms.ClearableFileInput):
+    """File input which sends the file in chunks to the url in its
+    data-upload-url attribute, see registrations.uploads."""
+
+    template_name = "registrations/widgets/chunked_file_input.html"
+
 
 class AttachmentsQuestion(
         TemplatedFormMixin,
@@ -79,6 +88,19 @@ class NewAttachmentQuestion(
             "upload",
         ]
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk is None and self.get_blueprint() is not None:
+            # Large files are sent in chunks, before the form is submitted
+            self.fields["upload"].widget = ChunkedFileInput(
+                attrs={
+                    "data-upload-url": reverse(
+                        "registrations:start_attachment_upload",
+                        kwargs={"reg_pk": self.get_registration().pk},
+                    ),
+                },
+            )
+
     def get_segments(self):
         return self._fields_to_segments(
             self.Meta.fields,
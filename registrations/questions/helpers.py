@@ -1,5 +1,6 @@
 from django.urls import reverse
 from django.template import loader, Template
+from django.utils.functional import SimpleLazyObject
 
 from cdh.questions import questions
 
@@ -16,7 +17,7 @@ class RegistrationQuestionMixin(ProgressItemMixin):
     
     # The initials faqs variable can be a FAQList slug
     # or other init argument to RenderableFAQList.
-    # At runtime self.faqs gets replaced by the
+    # At runtime self.faqs gets replaced by a lazy
     # RenderableFAQList object.
     faqs = None
     description = Template("")
@@ -34,8 +35,11 @@ class RegistrationQuestionMixin(ProgressItemMixin):
             self.faqs = self.slug
         # A RenderableFaqList gathers the FAQ objects
         # and help text to be rendered in the sidebar
-        # of this question.
-        self.faqs = RenderableFaqList(self.faqs)
+        # of this question. Most questions in a blueprint
+        # are never rendered, so it is only created once
+        # it is actually used.
+        faqs = self.faqs
+        self.faqs = SimpleLazyObject(lambda: RenderableFaqList(faqs))
         return super().__init__(*args, **kwargs)
 
     def get_registration(self):
@@ -0,0 +1,264 @@
+"""
+Full-text search over registrations.
+
+Every registration has a RegistrationSearchDocument holding the
+normalized text of its title, research goal, applicant names and the
+names of its involved groups, receivers and software. The document is
+rebuilt by registrations.signals whenever any of those change, and can
+be rebuilt for all registrations with the rebuild_search_index command.
+Migration 0043 built them for the registrations that existed before.
+
+Searching goes through a token index when the database offers one:
+an FTS5 table on SQLite, a FULLTEXT index on MySQL. Otherwise tokens
+are matched against the search document column.
+"""
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import Case, When, Value, IntegerField
+from django.db.models.expressions import RawSQL
+
+from .models import Registration, RegistrationSearchDocument
+
+FTS_TABLE = "registrations_search_fts"
+
+# Searching for more words than this won't narrow down anything
+MAX_TOKENS = 10
+
+
+def normalize(text):
+    """Lowercase text, strip accents and punctuation."""
+    text = unicodedata.normalize("NFKD", str(text or ""))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(re.findall(r"\w+", text.casefold()))
+
+
+def tokenize(query):
+    return normalize(query).split()[:MAX_TOKENS]
+
+
+def get_search_text(registration):
+    """Return the normalized title and search document of
+    registration."""
+    users = [registration.created_by, *registration.applicants.all()]
+    parts = [
+        registration.registration_title,
+        registration.research_goal,
+    ]
+    for user in users:
+        if user is not None:
+            parts += [user.first_name, user.last_name]
+    for related_name in ["involved_groups", "receivers", "software"]:
+        parts += [
+            obj.name for obj in getattr(registration, related_name).all()
+        ]
+    return (
+        normalize(registration.registration_title),
+        normalize(" ".join(parts)),
+    )
+
+
+class ContainsBackend():
+    """Matches every token as a substring of the search document and
+    ranks registrations by the number of tokens in their title. Used
+    when the database offers no usable full-text index."""
+
+    def index(self, registration_pk, title, document):
+        pass
+
+    def remove(self, registration_pk):
+        pass
+
+    def clear(self):
+        pass
+
+    def get_rank(self, tokens):
+        return sum(
+            [
+                Case(
+                    When(search_document__title__contains=token,
+                         then=Value(1)),
+                    default=Value(0),
+                    output_field=IntegerField(),
+                )
+                for token in tokens
+            ],
+            Value(0),
+        )
+
+    def search(self, qs, tokens):
+        for token in tokens:
+            qs = qs.filter(search_document__document__contains=token)
+        return qs.annotate(search_rank=self.get_rank(tokens))
+
+
+class SQLiteFTSBackend(ContainsBackend):
+    """Keeps an FTS5 copy of the search documents, ranked by BM25 with
+    title matches weighing heavier."""
+
+    def index(self, registration_pk, title, document):
+        self.remove(registration_pk)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, document) "
+                "VALUES (%s, %s, %s)",
+                [registration_pk, title, document],
+            )
+
+    def remove(self, registration_pk):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid = %s",
+                [registration_pk],
+            )
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+
+    def search(self, qs, tokens):
+        # Tokens only contain word characters, quoting them keeps
+        # FTS5 from reading them as operators
+        match = " ".join(f'"{token}"*' for token in tokens)
+        qs = qs.filter(
+            pk__in=RawSQL(
+                f"SELECT rowid FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s",
+                [match],
+            ),
+        )
+        # bm25() is lower for better matches
+        rank = RawSQL(
+            f"SELECT -bm25({FTS_TABLE}, 10.0, 1.0) FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s "
+            f"AND rowid = {Registration._meta.db_table}.id",
+            [match],
+        )
+        return qs.annotate(search_rank=rank)
+
+
+class MySQLFulltextBackend(ContainsBackend):
+    """Uses the FULLTEXT index on the search document column."""
+
+    # Shorter words are left out of InnoDB's full-text index
+    # (innodb_ft_min_token_size)
+    min_token_size = 3
+
+    def search(self, qs, tokens):
+        indexed = [t for t in tokens if len(t) >= self.min_token_size]
+        short = [t for t in tokens if len(t) < self.min_token_size]
+        if not indexed:
+            return super().search(qs, tokens)
+        for token in short:
+            qs = qs.filter(search_document__document__contains=token)
+        against = " ".join(f"+{token}*" for token in indexed)
+        table = RegistrationSearchDocument._meta.db_table
+        qs = qs.filter(
+            pk__in=RawSQL(
+                f"SELECT registration_id FROM {table} "
+                "WHERE MATCH(document) AGAINST (%s IN BOOLEAN MODE)",
+                [against],
+            ),
+        )
+        rank = RawSQL(
+            f"SELECT MATCH(document) AGAINST (%s IN BOOLEAN MODE) "
+            f"FROM {table} "
+            f"WHERE registration_id = {Registration._meta.db_table}.id",
+            [against],
+        )
+        return qs.annotate(search_rank=rank)
+
+
+_backends = {}
+
+
+def get_backend():
+    vendor = connection.vendor
+    if vendor not in _backends:
+        if vendor == "mysql":
+            backend = MySQLFulltextBackend()
+        elif (
+                vendor == "sqlite" and
+                FTS_TABLE in connection.introspection.table_names()
+        ):
+            backend = SQLiteFTSBackend()
+        else:
+            backend = ContainsBackend()
+        _backends[vendor] = backend
+    return _backends[vendor]
+
+
+def update_search_document(registration_pk):
+    """Rebuild the search document of a single registration."""
+    registration = Registration.objects.select_related(
+        "created_by",
+    ).prefetch_related(
+        "applicants",
+        "involved_groups",
+        "receivers",
+        "software",
+    ).filter(pk=registration_pk).first()
+    if registration is None:
+        remove_search_document(registration_pk)
+        return
+    title, document = get_search_text(registration)
+    RegistrationSearchDocument.objects.update_or_create(
+        registration_id=registration.pk,
+        defaults={
+            "title": title,
+            "document": document,
+        },
+    )
+    get_backend().index(registration.pk, title, document)
+
+
+def remove_search_document(registration_pk):
+    RegistrationSearchDocument.objects.filter(
+        registration_id=registration_pk,
+    ).delete()
+    get_backend().remove(registration_pk)
+
+
+def rebuild_search_index(chunk_size=500):
+    """Rebuild the search documents of all registrations.
+    Returns the number of registrations indexed."""
+    backend = get_backend()
+    backend.clear()
+    RegistrationSearchDocument.objects.all().delete()
+    registrations = Registration.objects.select_related(
+        "created_by",
+    ).prefetch_related(
+        "applicants",
+        "involved_groups",
+        "receivers",
+        "software",
+    ).order_by("pk")
+    count = 0
+    documents = []
+    for registration in registrations.iterator(chunk_size=chunk_size):
+        title, document = get_search_text(registration)
+        documents.append(
+            RegistrationSearchDocument(
+                registration_id=registration.pk,
+                title=title,
+                document=document,
+            )
+        )
+        backend.index(registration.pk, title, document)
+        count += 1
+        if len(documents) >= chunk_size:
+            RegistrationSearchDocument.objects.bulk_create(documents)
+            documents = []
+    RegistrationSearchDocument.objects.bulk_create(documents)
+    return count
+
+
+def search(qs, query):
+    """Filter a Registration queryset on query and order it by
+    relevance. Every word in query must match."""
+    tokens = tokenize(query)
+    if not tokens:
+        return qs
+    qs = get_backend().search(qs, tokens)
+    return qs.order_by("-search_rank", "-created_on", "-pk")
@@ -0,0 +1,277 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import pre_save, post_save, pre_delete, \
+    post_delete, m2m_changed
+
+from .models import Registration, Involved, Receiver, Software, Attachment, \
+    Faq, FaqList
+from .utils import FAQ_REGISTRY
+from . import search
+from .storage import release_blob
+
+USER_MODEL = get_user_model()
+
+# Models whose changes alter the outcome of a RegistrationBlueprint
+REGISTRATION_SUBMODELS = [
+    Involved,
+    Receiver,
+    Software,
+    Attachment,
+]
+
+
+def bump_registration_revision(instance):
+    """Bump the revision of the registration a sub-object belongs to.
+    If that registration is loaded on the instance, keep it up to date
+    as well so cache lookups from the same request don't go stale."""
+    field = instance._meta.get_field("registration")
+    if field.is_cached(instance):
+        instance.registration.bump_revision()
+    else:
+        Registration.objects.filter(pk=instance.registration_id).update(
+            revision=F("revision") + 1,
+        )
+
+
+def submodel_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    bump_registration_revision(instance)
+
+
+# Through models of the detail M2Ms of Involved, and their field names
+DETAIL_FIELDS = {
+    field.remote_field.through: field.name
+    for field in Involved._meta.many_to_many
+}
+
+
+def bump_detail_registrations(field_name, detail):
+    """Bump the revision of every registration with an involved group
+    that has detail in the field with field_name."""
+    Registration.objects.filter(
+        **{f"involved_groups__{field_name}": detail},
+    ).update(
+        revision=F("revision") + 1,
+    )
+
+
+def involved_details_changed(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    """Detail M2Ms are edited through the details questions, so
+    changes to them also change the registration."""
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            bump_registration_revision(instance)
+    elif action in ("post_add", "post_remove") and pk_set:
+        Registration.objects.filter(
+            involved_groups__pk__in=pk_set,
+        ).update(
+            revision=F("revision") + 1,
+        )
+    elif action == "pre_clear":
+        # Afterwards there is no telling which groups had this detail.
+        # The clear happens in the same transaction.
+        bump_detail_registrations(DETAIL_FIELDS[sender], instance)
+
+
+def detail_deleted(sender, instance, **kwargs):
+    """Deleting a detail removes it from involved groups without
+    sending m2m_changed, so their registrations are bumped before
+    its links are gone."""
+    for field in Involved._meta.many_to_many:
+        if field.related_model is sender:
+            bump_detail_registrations(field.name, instance)
+
+
+for model in REGISTRATION_SUBMODELS:
+    post_save.connect(
+        submodel_changed,
+        sender=model,
+        dispatch_uid=f"{model.__name__}_saved_revision",
+    )
+    post_delete.connect(
+        submodel_changed,
+        sender=model,
+        dispatch_uid=f"{model.__name__}_deleted_revision",
+    )
+
+for field in Involved._meta.many_to_many:
+    m2m_changed.connect(
+        involved_details_changed,
+        sender=field.remote_field.through,
+        dispatch_uid=f"involved_{field.name}_changed_revision",
+    )
+    pre_delete.connect(
+        detail_deleted,
+        sender=field.related_model,
+        dispatch_uid=f"involved_{field.name}_detail_deleted_revision",
+    )
+
+
+def faqs_changed(sender, **kwargs):
+    # Other processes reload as soon as the generation changes, so
+    # they must not be able to read the rows before the commit
+    transaction.on_commit(FAQ_REGISTRY.invalidate)
+
+
+for model in [Faq, FaqList]:
+    post_save.connect(
+        faqs_changed,
+        sender=model,
+        dispatch_uid=f"{model.__name__}_saved_faq_registry",
+    )
+    post_delete.connect(
+        faqs_changed,
+        sender=model,
+        dispatch_uid=f"{model.__name__}_deleted_faq_registry",
+    )
+
+m2m_changed.connect(
+    faqs_changed,
+    sender=FaqList.faqs.through,
+    dispatch_uid="faqlist_faqs_changed_faq_registry",
+)
+
+
+# Sub-models whose names end up in the search document
+SEARCH_SUBMODELS = [
+    Involved,
+    Receiver,
+    Software,
+]
+
+
+def schedule_search_update(registration_pk):
+    if registration_pk is None:
+        return
+    transaction.on_commit(
+        lambda: search.update_search_document(registration_pk),
+    )
+
+
+def registration_search_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    schedule_search_update(instance.pk)
+
+
+def registration_search_deleted(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: search.remove_search_document(pk))
+
+
+def submodel_search_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    schedule_search_update(instance.registration_id)
+
+
+def applicants_changed(sender, instance, action, reverse, pk_set,
+                       **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        schedule_search_update(instance.pk)
+    elif pk_set:
+        for pk in pk_set:
+            schedule_search_update(pk)
+
+
+def user_search_changed(sender, instance, created=False, raw=False,
+                        update_fields=None, **kwargs):
+    """Names of creators and applicants are searchable. Users are saved
+    on every login, so only act when their names may have changed. New
+    users aren't part of any registration yet."""
+    if raw or created:
+        return
+    if update_fields is not None and \
+       not {"first_name", "last_name"} & set(update_fields):
+        return
+    registrations = Registration.objects.filter(
+        created_by=instance,
+    ).values_list("pk", flat=True).union(
+        instance.applicant_for.values_list("pk", flat=True),
+    )
+    for pk in registrations:
+        schedule_search_update(pk)
+
+
+post_save.connect(
+    registration_search_changed,
+    sender=Registration,
+    dispatch_uid="registration_saved_search",
+)
+post_delete.connect(
+    registration_search_deleted,
+    sender=Registration,
+    dispatch_uid="registration_deleted_search",
+)
+
+for model in SEARCH_SUBMODELS:
+    post_save.connect(
+        submodel_search_changed,
+        sender=model,
+        dispatch_uid=f"{model.__name__}_saved_search",
+    )
+    post_delete.connect(
+        submodel_search_changed,
+        sender=model,
+        dispatch_uid=f"{model.__name__}_deleted_search",
+    )
+
+m2m_changed.connect(
+    applicants_changed,
+    sender=Registration.applicants.through,
+    dispatch_uid="registration_applicants_changed_search",
+)
+post_save.connect(
+    user_search_changed,
+    sender=USER_MODEL,
+    dispatch_uid="user_saved_search",
+)
+
+
+# Attachment files are shared between attachments with the same
+# contents. Once the last attachment referring to a file is deleted or
+# given another file, the file itself is removed.
+
+def schedule_blob_release(name):
+    transaction.on_commit(lambda: release_blob(name))
+
+
+def attachment_file_replaced(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None or instance.upload._committed:
+        return
+    instance._replaced_upload = Attachment.objects.filter(
+        pk=instance.pk,
+    ).values_list("upload", flat=True).first()
+
+
+def attachment_saved(sender, instance, raw=False, **kwargs):
+    replaced = getattr(instance, "_replaced_upload", None)
+    if replaced and replaced != instance.upload.name:
+        schedule_blob_release(replaced)
+    instance._replaced_upload = None
+
+
+def attachment_deleted(sender, instance, **kwargs):
+    schedule_blob_release(instance.upload.name)
+
+
+pre_save.connect(
+    attachment_file_replaced,
+    sender=Attachment,
+    dispatch_uid="attachment_file_replaced",
+)
+post_save.connect(
+    attachment_saved,
+    sender=Attachment,
+    dispatch_uid="attachment_saved_blob",
+)
+post_delete.connect(
+    attachment_deleted,
+    sender=Attachment,
+    dispatch_uid="attachment_deleted_blob",
+)
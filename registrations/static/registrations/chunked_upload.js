@@ -0,0 +1,129 @@
+/*
+ * Sends files selected in inputs with a data-upload-url attribute in
+ * chunks, instead of as part of the form. An interrupted upload of the
+ * same file continues where it stopped, see registrations.uploads.
+ */
+(function () {
+    "use strict";
+
+    var CHUNK_SIZE = 4 * 1024 * 1024;
+    var MAX_RETRIES = 5;
+
+    function storageKey(input, file) {
+        return [
+            "procreg:upload",
+            input.dataset.uploadUrl,
+            file.name,
+            file.size,
+            file.lastModified
+        ].join(":");
+    }
+
+    function csrfToken(form) {
+        var field = form.querySelector("input[name=csrfmiddlewaretoken]");
+        return field ? field.value : "";
+    }
+
+    function checkResponse(response) {
+        return response.json().then(function (data) {
+            if (!response.ok && response.status !== 409) {
+                throw new Error(data.error || response.statusText);
+            }
+            return data;
+        });
+    }
+
+    function startUpload(input, file, form) {
+        var key = storageKey(input, file);
+        var url = window.localStorage.getItem(key);
+        if (url) {
+            // Ask how far the previous attempt came
+            return fetch(url, {credentials: "same-origin"}).then(function (response) {
+                if (response.ok) {
+                    return response.json();
+                }
+                window.localStorage.removeItem(key);
+                return startUpload(input, file, form);
+            });
+        }
+        var data = new FormData();
+        data.append("filename", file.name);
+        data.append("size", file.size);
+        var description = form.querySelector("[name=file_description]");
+        if (description) {
+            data.append("file_description", description.value);
+        }
+        return fetch(input.dataset.uploadUrl, {
+            method: "POST",
+            body: data,
+            credentials: "same-origin",
+            headers: {"X-CSRFToken": csrfToken(form)}
+        }).then(checkResponse).then(function (status) {
+            window.localStorage.setItem(key, status.url);
+            return status;
+        });
+    }
+
+    function sendChunks(status, file, form, progress, retries) {
+        if (status.complete) {
+            return Promise.resolve(status);
+        }
+        var end = Math.min(status.offset + CHUNK_SIZE, file.size);
+        progress.value = status.offset;
+        return fetch(status.url, {
+            method: "PUT",
+            body: file.slice(status.offset, end),
+            credentials: "same-origin",
+            headers: {
+                "X-CSRFToken": csrfToken(form),
+                "Content-Range": "bytes " + status.offset + "-" + (end - 1) + "/" + file.size
+            }
+        }).then(checkResponse).then(function (next) {
+            return sendChunks(next, file, form, progress, MAX_RETRIES);
+        }, function (error) {
+            if (retries <= 0) {
+                throw error;
+            }
+            // Continue from the offset the server has
+            return fetch(status.url, {credentials: "same-origin"})
+                .then(checkResponse)
+                .then(function (current) {
+                    return sendChunks(current, file, form, progress, retries - 1);
+                });
+        });
+    }
+
+    function upload(input, form) {
+        var file = input.files[0];
+        var progress = document.createElement("progress");
+        progress.max = file.size;
+        input.after(progress);
+        input.disabled = true;
+        return startUpload(input, file, form).then(function (status) {
+            return sendChunks(status, file, form, progress, MAX_RETRIES);
+        }).then(function (status) {
+            window.localStorage.removeItem(storageKey(input, file));
+            window.location = status.success_url;
+        }, function (error) {
+            input.disabled = false;
+            progress.remove();
+            window.alert(error.message);
+        });
+    }
+
+    document.addEventListener("DOMContentLoaded", function () {
+        document.querySelectorAll("input[type=file][data-upload-url]").forEach(function (input) {
+            var form = input.form;
+            if (!form || !window.fetch) {
+                return;
+            }
+            form.addEventListener("submit", function (event) {
+                if (!input.files.length) {
+                    return;
+                }
+                event.preventDefault();
+                upload(input, form);
+            });
+        });
+    });
+})();
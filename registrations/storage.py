@@ -0,0 +1,166 @@
+"""
+Content-addressed storage for attachments.
+
+Every attachment file is stored once, under the SHA-256 of its
+contents, no matter how many registrations it is attached to. Saving
+a file that is already stored doesn't write anything. Attachments
+sharing a file share its name, so the number of Attachment rows with
+that name is its reference count. When the last one is deleted,
+release_blob removes the file, see registrations.signals.
+
+Storing and removing files are serialized with a file lock. Even so,
+an attachment reusing a stored file only becomes visible to other
+processes when it is committed. Reusing a file therefore marks it as
+recently used, and release_blob leaves such files alone. Files left
+behind that way are removed by remove_unreferenced_blobs, which runs
+as part of the cleanup_uploads command.
+
+Files stored before attachments were content-addressed were moved here
+by migration 0044. Attachments whose file was missing then keep their
+old name, outside BLOB_DIR, which release_blob leaves alone.
+"""
+import hashlib
+import os
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import locks
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+BLOB_DIR = "attachments"
+LOCK_NAME = f"{BLOB_DIR}/.lock"
+
+# Files stored or reused this recently may belong to an attachment
+# that isn't committed yet, so they are never removed
+BLOB_GRACE_PERIOD = getattr(
+    settings,
+    "PROCREG_BLOB_GRACE_PERIOD",
+    timedelta(hours=1),
+)
+
+# Longer extensions are dropped from blob names
+MAX_EXTENSION_LENGTH = 16
+
+
+def hash_file(f):
+    """Return the hex SHA-256 of file-like object f, read in chunks."""
+    hasher = hashlib.sha256()
+    if hasattr(f, "seek"):
+        f.seek(0)
+    if hasattr(f, "chunks"):
+        for chunk in f.chunks():
+            hasher.update(chunk)
+    else:
+        for chunk in iter(lambda: f.read(64 * 1024), b""):
+            hasher.update(chunk)
+    if hasattr(f, "seek"):
+        f.seek(0)
+    return hasher.hexdigest()
+
+
+def get_blob_name(digest, filename=""):
+    """Keep the extension, so that files are served with the
+    right content type."""
+    extension = os.path.splitext(filename)[1].lower()
+    if len(extension) > MAX_EXTENSION_LENGTH:
+        extension = ""
+    return f"{BLOB_DIR}/{digest[:2]}/{digest}{extension}"
+
+
+def attachment_upload_to(instance, filename):
+    if not instance.sha256:
+        instance.sha256 = hash_file(instance.upload)
+    return get_blob_name(instance.sha256, filename)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+
+    def is_blob(self, name):
+        return name.startswith(f"{BLOB_DIR}/") and name != LOCK_NAME
+
+    @contextmanager
+    def lock(self):
+        """Exclusive lock on storing and removing files, shared by all
+        processes using this storage."""
+        path = self.path(LOCK_NAME)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "ab") as f:
+            locks.lock(f, locks.LOCK_EX)
+            try:
+                yield
+            finally:
+                locks.unlock(f)
+
+    def save(self, name, content, max_length=None):
+        if not self.is_blob(name):
+            return super().save(name, content, max_length=max_length)
+        with self.lock():
+            if not self.exists(name):
+                return super().save(name, content, max_length=max_length)
+            # Same name, same contents. Mark it as used, so it isn't
+            # removed before the attachment using it is committed.
+            os.utime(self.path(name))
+        return name
+
+    def is_recent(self, name):
+        age = time.time() - os.path.getmtime(self.path(name))
+        return age < BLOB_GRACE_PERIOD.total_seconds()
+
+
+attachment_storage = ContentAddressedStorage()
+
+
+def release_blob(name):
+    """Remove the stored file name if no attachment refers to it
+    anymore."""
+    # Avoid a circular import, models use this module
+    from .models import Attachment
+
+    if not name or not attachment_storage.is_blob(name):
+        return
+    with attachment_storage.lock():
+        if not attachment_storage.exists(name):
+            return
+        if attachment_storage.is_recent(name):
+            return
+        if Attachment.objects.filter(upload=name).exists():
+            return
+        attachment_storage.delete(name)
+
+
+def remove_unreferenced_blobs():
+    """Remove stored files no attachment refers to, which were left
+    behind by release_blob. Returns the number removed."""
+    from .models import Attachment
+
+    storage = attachment_storage
+    if not storage.exists(BLOB_DIR):
+        return 0
+    names = []
+    for directory in storage.listdir(BLOB_DIR)[0]:
+        names += [
+            f"{BLOB_DIR}/{directory}/{filename}"
+            for filename in storage.listdir(f"{BLOB_DIR}/{directory}")[1]
+        ]
+    count = 0
+    # Look up the references of many files at once
+    for start in range(0, len(names), 500):
+        batch = names[start:start + 500]
+        referenced = set(
+            Attachment.objects.filter(
+                upload__in=batch,
+            ).values_list("upload", flat=True)
+        )
+        for name in batch:
+            if name in referenced:
+                continue
+            with storage.lock():
+                if storage.exists(name) and not storage.is_recent(name) \
+                   and not Attachment.objects.filter(upload=name).exists():
+                    storage.delete(name)
+                    count += 1
+    return count
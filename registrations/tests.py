@@ -1,3 +1,1167 @@
-from django.test import TestCase
+import csv
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib import admin, messages
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.contrib.messages import get_messages
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.core.files.base import ContentFile
+from django.db import connection, models, transaction
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, \
+    override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import translation
+
+from . import downloads, export, search, storage, transitions, uploads
+from .admin import mark_registered
+from .benchmarks import BlueprintBenchmark, Fixture
+from .blueprints import RegistrationBlueprint, BlueprintErrors
+from .clone import clone_registration
+from .models import Registration, FaqList, Involved, Attachment, \
+    AttachmentUpload, RegistrationSearchDocument, StatusChange
+from .progress import RegistrationProgressBar
+from .views.lists.listview import MyRegistrationsList, \
+    PORegistrationsExport, PORegistrationsList, ToggleFavouriteView
+from .views.uploads import AttachmentUploadView
+from .views.views import RegistrationOverview, RegistrationQuestionEditView
+
+
+@override_settings(CACHES=BlueprintBenchmark.cache_settings)
+class QueryCountTests(TestCase):
+    """
+    The number of queries of building a blueprint and of the main views
+    must not grow with the size of a registration. Every scenario of
+    the benchmarks is counted on a tiny registration, and must take
+    exactly as many queries on a larger one.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        FaqList.objects.create(slug="default")
+        benchmark = BlueprintBenchmark(repeat=1)
+        user = benchmark.create_user()
+        cls.tiny = Fixture("tiny", user)
+        cls.small = Fixture("small", user)
+
+    def setUp(self):
+        self.benchmark = BlueprintBenchmark(repeat=1)
+
+    def get_scenario(self, fixture, scenario):
+        # Start cold, without anything cached for the user or the
+        # registration from a previous scenario
+        cache.clear()
+        fixture.user = get_user_model().objects.get(pk=fixture.user.pk)
+        return dict(self.benchmark.get_scenarios(fixture))[scenario]
+
+    def count_queries(self, fixture, scenario):
+        func = self.get_scenario(fixture, scenario)
+        with CaptureQueriesContext(connection) as context:
+            func()
+        return len(context.captured_queries)
+
+    def assertConstantQueries(self, scenario):
+        expected = self.count_queries(self.tiny, scenario)
+        func = self.get_scenario(self.small, scenario)
+        with self.assertNumQueries(expected):
+            func()
+
+    def test_blueprint(self):
+        self.assertConstantQueries("blueprint")
+
+    def test_blueprint_queries(self):
+        registration = Registration.objects.get(pk=self.small.registration.pk)
+        cache.clear()
+        # The registration's sub-objects and the FAQ lists, once each
+        with self.assertNumQueries(10):
+            RegistrationBlueprint(registration)
+
+    def test_overview(self):
+        self.assertConstantQueries("overview")
+
+    def test_summary(self):
+        self.assertConstantQueries("summary")
+
+    def test_involved_manager(self):
+        self.assertConstantQueries("involved_manager")
+
+    def test_question_edit_get(self):
+        self.assertConstantQueries("question_edit_get")
+
+    def test_question_edit_post(self):
+        self.assertConstantQueries("question_edit_post")
+
+    def test_my_list(self):
+        self.assertConstantQueries("my_list")
+
+    def test_po_list(self):
+        self.assertConstantQueries("po_list")
+
+
+def describe_blueprint(blueprint):
+    """The outcome of a blueprint, as plain data to compare."""
+
+    def key(question):
+        instance = getattr(question, "instance", None)
+        return (question.slug, getattr(instance, "pk", None))
+
+    return {
+        "questions": [
+            key(q) + (
+                bool(getattr(q, "complete", False)),
+                bool(getattr(q, "incomplete", False)),
+            )
+            for q in blueprint.questions
+        ],
+        "desired_next": [key(q) for q in blueprint.desired_next],
+        "completed": [key(q) for q in blueprint.completed],
+        "top_questions": [key(q) for q in blueprint.top_questions],
+        "selected_groups": [str(g) for g in blueprint.selected_groups],
+        "errors": [
+            tuple(str(part) for part in error)
+            for error in blueprint.errors.all_errors
+        ],
+        "top_questions_incomplete": getattr(
+            blueprint, "top_questions_incomplete", False,
+        ),
+    }
+
+
+def get_answers(instance, name):
+    """Other answers than the current one for the field with name."""
+    field = instance._meta.get_field(name)
+    if field.many_to_many:
+        return [[]]
+    current = getattr(instance, field.attname)
+    if field.choices:
+        answers = [value for value, label in field.flatchoices]
+    elif isinstance(field, models.BooleanField):
+        answers = [True, False]
+    elif isinstance(field, (models.CharField, models.TextField)):
+        answers = ["", "Changed"]
+    else:
+        answers = []
+    if field.null:
+        answers.append(None)
+    # Forms don't accept empty answers to required fields
+    return [
+        answer for answer in answers
+        if answer != current
+        and (field.blank or answer not in field.empty_values)
+    ]
+
+
+@override_settings(CACHES=BlueprintBenchmark.cache_settings)
+class ReevaluateTests(TestCase):
+    """
+    After a question is saved, re-evaluating the blueprint must give the
+    same outcome as building a new one. Every answer to every field of
+    every question is tried, on a complete registration and on one that
+    was just started.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        FaqList.objects.create(slug="default")
+        user = BlueprintBenchmark(repeat=1).create_user()
+        cls.complete = Fixture("tiny", user).registration
+        cls.started = Registration.objects.create(
+            registration_title="Just started",
+            created_by=user,
+        )
+
+    def get_questions(self, registration):
+        blueprint = RegistrationBlueprint(
+            Registration.objects.get(pk=registration.pk),
+        )
+        return [
+            (q.slug, type(q.instance), q.instance.pk, name)
+            for q in blueprint.questions
+            if getattr(q, "instance", None) is not None
+            and q.instance.pk is not None
+            for name in q._meta.fields
+        ]
+
+    def save_answer(self, blueprint, slug, pk, name, answer):
+        question = blueprint.get_question(slug, question_pk=pk)
+        instance = question.instance
+        if instance._meta.get_field(name).many_to_many:
+            getattr(instance, name).set(answer)
+        else:
+            setattr(instance, name, answer)
+            instance.save()
+        return instance
+
+    def assertReevaluated(self, registration):
+        for slug, model, pk, name in self.get_questions(registration):
+            for answer in get_answers(model.objects.get(pk=pk), name):
+                with self.subTest(question=slug, field=name, answer=answer):
+                    with transaction.atomic():
+                        cache.clear()
+                        blueprint = RegistrationBlueprint(
+                            Registration.objects.get(pk=registration.pk),
+                        )
+                        instance = self.save_answer(
+                            blueprint, slug, pk, name, answer,
+                        )
+                        # The question is in the blueprint, so it
+                        # must be re-evaluated rather than rebuilt
+                        self.assertTrue(blueprint.reevaluate(slug, instance))
+                        fresh = RegistrationBlueprint(
+                            Registration.objects.get(pk=registration.pk),
+                        )
+                        self.assertEqual(
+                            describe_blueprint(blueprint),
+                            describe_blueprint(fresh),
+                        )
+                        transaction.set_rollback(True)
+
+    def test_complete_registration(self):
+        self.assertReevaluated(self.complete)
+
+    def test_started_registration(self):
+        self.assertReevaluated(self.started)
+
+
+@override_settings(CACHES=BlueprintBenchmark.cache_settings)
+class QuestionFromBlueprintTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        FaqList.objects.create(slug="default")
+        user = BlueprintBenchmark(repeat=1).create_user()
+        cls.registration = Fixture("tiny", user).registration
+
+    def test_question_after_refresh(self):
+        pk = self.registration.pk
+        kwargs = {"reg_pk": pk, "question": "goal", "question_pk": pk}
+        request = RequestFactory().post(
+            reverse("registrations:edit_question", kwargs=kwargs),
+        )
+        request.user = self.registration.created_by
+        view = RegistrationQuestionEditView()
+        view.setup(request, **kwargs)
+        before = view.get_question()
+        view.object = before.instance
+        view.object.research_goal = "Changed"
+        view.object.save()
+        blueprint = view.refresh_blueprint()
+        after = view.get_question()
+        self.assertIsNot(after, before)
+        self.assertIs(after, blueprint.get_question("goal", question_pk=pk))
+
+
+@override_settings(CACHES=BlueprintBenchmark.cache_settings)
+class ProgressBarTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        FaqList.objects.create(slug="default")
+        user = BlueprintBenchmark(repeat=1).create_user()
+        cls.registration = Fixture("tiny", user).registration
+
+    def get_involved_titles(self, language):
+        with translation.override(language):
+            blueprint = RegistrationBlueprint(self.registration)
+            manager = next(
+                item for item in blueprint.progress_bar.items
+                if item.slug == "involved_manager"
+            )
+        return [child.title for child in manager.children[0].children]
+
+    def test_involved_titles_translated(self):
+        cache.clear()
+        for language in ("en", "nl"):
+            with translation.override(language):
+                expected = [
+                    translation.gettext(f"registrations:progress:{slug}")
+                    for slug, title in RegistrationProgressBar.involved_slugs
+                ]
+            titles = self.get_involved_titles(language)
+            self.assertEqual(titles, expected)
+            # Resolved before caching, not stored as lazy strings
+            self.assertTrue(all(type(title) is str for title in titles))
+
+
+# Every checkbox of the list filters unchecked. Unchecked boxes are
+# passed as an empty string, see the hidden inputs in the templates.
+NOTHING_CHECKED = {
+    "include_drafts": "",
+    "include_submitted": "",
+    "include_registered": "",
+    "include_favourites": "",
+}
+
+
+@override_settings(CACHES=BlueprintBenchmark.cache_settings)
+class ListFilterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = BlueprintBenchmark(repeat=1).create_user()
+        cls.registration = Registration.objects.create(
+            registration_title="Mine",
+            created_by=cls.user,
+        )
+
+    def get_results(self, view, url, data):
+        request = RequestFactory().get(url, data=data)
+        request.user = get_user_model().objects.get(pk=self.user.pk)
+        response = view.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+        return list(response.context_data["results"])
+
+    def test_nothing_checked(self):
+        for view, url in [
+            (MyRegistrationsList, reverse("registrations:my_list")),
+            (PORegistrationsList, reverse("registrations:po_list")),
+        ]:
+            with self.subTest(view=view.__name__):
+                self.assertEqual(
+                    self.get_results(view, url, NOTHING_CHECKED), [],
+                )
+
+
+@override_settings(CACHES=BlueprintBenchmark.cache_settings)
+class FavouriteTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.user = User.objects.create(username="favourites-user")
+        cls.other = User.objects.create(username="favourites-other")
+        cls.draft = Registration.objects.create(
+            registration_title="Draft",
+            created_by=cls.user,
+        )
+        cls.registered = Registration.objects.create(
+            registration_title="Registered",
+            created_by=cls.user,
+            status="registered",
+        )
+        cls.applicant_for = Registration.objects.create(
+            registration_title="Applicant for",
+            created_by=cls.other,
+            status="submitted",
+        )
+        cls.applicant_for.applicants.add(cls.user)
+        cls.not_involved = Registration.objects.create(
+            registration_title="Not involved",
+            created_by=cls.other,
+        )
+
+    def get_user(self):
+        return get_user_model().objects.get(pk=self.user.pk)
+
+    def toggle(self, registration):
+        url = reverse(
+            "registrations:toggle_favourite",
+            kwargs={"reg_pk": registration.pk},
+        )
+        request = RequestFactory().post(url)
+        request.user = self.get_user()
+        return ToggleFavouriteView.as_view()(request, reg_pk=registration.pk)
+
+    def get_results(self, **checked):
+        data = dict(NOTHING_CHECKED)
+        data.update({name: "on" for name in checked})
+        request = RequestFactory().get(
+            reverse("registrations:my_list"),
+            data=data,
+        )
+        request.user = self.get_user()
+        response = MyRegistrationsList.as_view()(request)
+        return {r.registration_title for r in response.context_data["results"]}
+
+    def test_toggle(self):
+        response = self.toggle(self.draft)
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(self.draft.favourited_by.filter(pk=self.user.pk))
+        self.toggle(self.draft)
+        self.assertFalse(self.draft.favourited_by.filter(pk=self.user.pk))
+
+    def test_not_involved(self):
+        with self.assertRaises(Http404):
+            self.toggle(self.not_involved)
+        self.assertFalse(self.not_involved.favourited_by.exists())
+
+    def test_po_not_involved(self):
+        self.user.groups.add(Group.objects.get_or_create(name="PO")[0])
+        self.toggle(self.not_involved)
+        self.assertTrue(
+            self.not_involved.favourited_by.filter(pk=self.user.pk),
+        )
+
+    def test_statuses(self):
+        self.assertEqual(
+            self.get_results(include_drafts=True),
+            {"Draft"},
+        )
+        self.assertEqual(
+            self.get_results(include_submitted=True, include_registered=True),
+            {"Registered", "Applicant for"},
+        )
+
+    def test_favourite_any_status(self):
+        self.registered.favourited_by.add(self.user)
+        self.assertEqual(
+            self.get_results(include_drafts=True, include_favourites=True),
+            {"Draft", "Registered"},
+        )
+        self.assertEqual(
+            self.get_results(include_drafts=True),
+            {"Draft"},
+        )
+        self.assertEqual(
+            self.get_results(include_favourites=True),
+            {"Registered"},
+        )
+
+    def test_favourite_not_involved(self):
+        # Favourited while in the PO group, which the user left since
+        self.not_involved.favourited_by.add(self.user)
+        self.assertEqual(
+            self.get_results(include_drafts=True),
+            {"Draft"},
+        )
+        self.assertEqual(
+            self.get_results(include_drafts=True, include_favourites=True),
+            {"Draft", "Not involved"},
+        )
+
+
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(
+            username="search-creator",
+            first_name="Jan",
+            last_name="Éénmaal",
+        )
+
+    def create_registration(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Registration.objects.create(created_by=self.user, **kwargs)
+
+    def search(self, query):
+        return list(search.search(Registration.objects.all(), query))
+
+    def test_indexed(self):
+        self.assertIsInstance(search.get_backend(), search.SQLiteFTSBackend)
+        registration = self.create_registration(
+            registration_title="Ringing bells",
+        )
+        self.assertEqual(self.search("ringing"), [registration])
+        # Prefixes, every word, any order, without accents
+        self.assertEqual(self.search("bell ring eenmaal"), [registration])
+        self.assertEqual(self.search("bells whistles"), [])
+
+    def test_contains_backend(self):
+        registration = self.create_registration(
+            registration_title="Ringing bells",
+        )
+        self.create_registration(research_goal="Ringing")
+        found = search.ContainsBackend().search(
+            Registration.objects.all(), ["bell", "eenmaal"],
+        )
+        self.assertEqual(list(found), [registration])
+
+    def test_title_ranks_first(self):
+        in_goal = self.create_registration(
+            registration_title="Other",
+            research_goal="Measuring reaction times",
+        )
+        in_title = self.create_registration(
+            registration_title="Reaction times",
+        )
+        self.assertEqual(self.search("reaction"), [in_title, in_goal])
+
+    def test_signals(self):
+        registration = self.create_registration(
+            registration_title="Ringing bells",
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            group = Involved.objects.create(
+                registration=registration,
+                group_type="other",
+                name="Students",
+            )
+        self.assertEqual(self.search("students"), [registration])
+        with self.captureOnCommitCallbacks(execute=True):
+            group.name = "Pupils"
+            group.save()
+        self.assertEqual(self.search("students"), [])
+        self.assertEqual(self.search("pupils"), [registration])
+        with self.captureOnCommitCallbacks(execute=True):
+            group.delete()
+        self.assertEqual(self.search("pupils"), [])
+
+    def test_user_signals(self):
+        registration = self.create_registration(
+            registration_title="Ringing bells",
+        )
+        applicant = get_user_model().objects.create(username="applicant")
+        with self.captureOnCommitCallbacks(execute=True):
+            registration.applicants.add(applicant)
+            applicant.first_name = "Marijke"
+            applicant.save()
+        self.assertEqual(self.search("marijke"), [registration])
+        with self.captureOnCommitCallbacks(execute=True):
+            registration.applicants.remove(applicant)
+        self.assertEqual(self.search("marijke"), [])
+
+    def test_delete(self):
+        registration = self.create_registration(
+            registration_title="Ringing bells",
+        )
+        pk = registration.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            registration.delete()
+        self.assertFalse(
+            RegistrationSearchDocument.objects.filter(
+                registration_id=pk,
+            ).exists()
+        )
+        self.assertEqual(self.search("ringing"), [])
+
+
+def describe_contents(registration):
+    """The contents of registration that cloning copies, as plain
+    data to compare."""
+    fields = {
+        "involved_groups": ["group_type", "name", "process_purpose"],
+        "receivers": ["name", "outside_eer"],
+        "software": ["name", "not_approved"],
+        "attachments": ["file_description", "upload", "sha256"],
+    }
+    contents = {
+        related_name: [
+            [getattr(obj, name) for name in names]
+            for obj in getattr(registration, related_name).order_by("pk")
+        ]
+        for related_name, names in fields.items()
+    }
+    contents["details"] = [
+        [
+            sorted(getattr(involved, field.name).values_list("pk", flat=True))
+            for field in Involved._meta.many_to_many
+        ]
+        for involved in registration.involved_groups.order_by("pk")
+    ]
+    contents["applicants"] = sorted(
+        registration.applicants.values_list("pk", flat=True),
+    )
+    return contents
+
+
+class CloneTests(TestCase):
+    """Cloning takes the same number of queries for registrations of
+    any size, also on databases that can't return primary keys from
+    bulk inserts."""
+
+    # Inserting the registration, copying its applicants, its involved
+    # groups and their six kinds of details, receivers, software and
+    # attachments, and bumping its revision
+    queries = 26
+
+    @classmethod
+    def setUpTestData(cls):
+        user = BlueprintBenchmark(repeat=1).create_user()
+        cls.user = user
+        cls.tiny = Fixture("tiny", user).registration
+        cls.small = Fixture("small", user).registration
+        applicant = get_user_model().objects.create(username="applicant")
+        for registration in [cls.tiny, cls.small]:
+            registration.applicants.add(applicant)
+
+    def assertCloned(self, source, queries):
+        with self.assertNumQueries(queries):
+            clone = clone_registration(source, self.user, title="Clone")
+        self.assertEqual(clone.registration_title, "Clone")
+        self.assertEqual(clone.status, "draft")
+        self.assertEqual(describe_contents(clone), describe_contents(source))
+
+    def test_clone(self):
+        for source in [self.tiny, self.small]:
+            with self.subTest(size=source.registration_title):
+                self.assertCloned(source, self.queries)
+
+    def test_clone_without_returned_pks(self):
+        features = type(connection.features)
+        for source in [self.tiny, self.small]:
+            with self.subTest(size=source.registration_title), \
+                    mock.patch.object(
+                        features,
+                        "can_return_rows_from_bulk_insert",
+                        False,
+                    ):
+                # Reading the involved groups back
+                self.assertCloned(source, self.queries + 1)
+
+
+@override_settings(CACHES=BlueprintBenchmark.cache_settings)
+class ExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = BlueprintBenchmark(repeat=1).create_user()
+        for title in ["First", "=1+1"]:
+            Registration.objects.create(
+                registration_title=title,
+                created_by=cls.user,
+            )
+
+    def export(self, export_format):
+        kwargs = {"export_format": export_format}
+        request = RequestFactory().get(
+            reverse("registrations:po_export", kwargs=kwargs),
+        )
+        request.user = get_user_model().objects.get(pk=self.user.pk)
+        return PORegistrationsExport.as_view()(request, **kwargs)
+
+    def get_titles(self, rows):
+        rows = list(rows)
+        column = rows[0].index("registration_title")
+        return sorted(row[column] for row in rows[1:])
+
+    def test_csv(self):
+        response = self.export("csv")
+        self.assertIsInstance(response, StreamingHttpResponse)
+        content = b"".join(response.streaming_content).decode()
+        titles = self.get_titles(csv.reader(io.StringIO(content)))
+        # Formulas are not run by spreadsheet programs
+        self.assertEqual(titles, ["'=1+1", "First"])
+
+    def test_xlsx(self):
+        if not export.xlsx_available():
+            self.skipTest("openpyxl is not installed")
+        response = self.export("xlsx")
+        self.assertIsInstance(response, FileResponse)
+        self.assertIn(
+            'filename="registrations_', response["Content-Disposition"],
+        )
+        workbook = export.openpyxl.load_workbook(
+            io.BytesIO(b"".join(response.streaming_content)),
+            read_only=True,
+        )
+        rows = workbook["Registrations"].iter_rows(values_only=True)
+        self.assertEqual(self.get_titles(rows), ["'=1+1", "First"])
+
+    def test_xlsx_unavailable(self):
+        with mock.patch.object(export, "openpyxl", None):
+            self.assertEqual(PORegistrationsExport.get_formats(), ["csv"])
+            with self.assertRaises(Http404):
+                self.export("xlsx")
+
+
+class TransitionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = BlueprintBenchmark(repeat=1).create_user()
+        cls.submitted = [
+            Registration.objects.create(
+                registration_title=f"Submitted {n}",
+                created_by=cls.user,
+                status="submitted",
+            )
+            for n in range(3)
+        ]
+        cls.draft = Registration.objects.create(
+            registration_title="Draft",
+            created_by=cls.user,
+        )
+
+    def get_statuses(self):
+        return dict(Registration.objects.values_list("pk", "status"))
+
+    def test_bulk_transition(self):
+        pks = [r.pk for r in self.submitted]
+        revisions = dict(Registration.objects.values_list("pk", "revision"))
+        result = transitions.bulk_transition(
+            [*pks, self.draft.pk],
+            "registered",
+            self.user,
+        )
+        self.assertEqual(result.changed, pks)
+        self.assertEqual(result.skipped, [self.draft.pk])
+        statuses = self.get_statuses()
+        for pk in pks:
+            self.assertEqual(statuses[pk], "registered")
+            self.assertEqual(
+                Registration.objects.get(pk=pk).revision,
+                revisions[pk] + 1,
+            )
+        self.assertEqual(statuses[self.draft.pk], "draft")
+        self.assertEqual(
+            sorted(
+                StatusChange.objects.values_list(
+                    "registration_id", "old_status", "new_status",
+                    "changed_by",
+                )
+            ),
+            [(pk, "submitted", "registered", self.user.pk) for pk in pks],
+        )
+
+    def test_skip_changed(self):
+        # Already registered, so it can't be registered again
+        transitions.bulk_transition(
+            [self.submitted[0].pk], "registered", self.user,
+        )
+        result = transitions.bulk_transition(
+            [self.submitted[0].pk], "draft", self.user,
+        )
+        self.assertEqual(result.changed, [])
+        self.assertEqual(result.skipped, [self.submitted[0].pk])
+        self.assertEqual(StatusChange.objects.count(), 1)
+
+    def test_batches(self):
+        pks = [r.pk for r in self.submitted]
+        # Locking, updating and recording each of the two batches, in
+        # a savepoint
+        with mock.patch.object(transitions, "BATCH_SIZE", 2), \
+                self.assertNumQueries(2 * 3 + 2):
+            result = transitions.bulk_transition(
+                [*pks, *pks], "draft", self.user,
+            )
+        self.assertEqual(result.changed, pks)
+        self.assertEqual(StatusChange.objects.count(), 3)
+
+    def test_unknown_status(self):
+        with self.assertRaises(transitions.TransitionError):
+            transitions.bulk_transition(
+                [self.draft.pk], "submitted", self.user,
+            )
+
+    def test_admin_action(self):
+        request = RequestFactory().post("/")
+        request.user = self.user
+        request.session = {}
+        request._messages = FallbackStorage(request)
+        queryset = Registration.objects.filter(
+            pk__in=[self.submitted[0].pk, self.draft.pk],
+        )
+        mark_registered(admin.site._registry[Registration], request, queryset)
+        self.assertEqual(
+            self.get_statuses()[self.submitted[0].pk], "registered",
+        )
+        self.assertEqual(
+            [m.level for m in get_messages(request)],
+            [messages.SUCCESS, messages.WARNING],
+        )
+
+
+class AttachmentTestCase(TestCase):
+    """Stores attachment files in a temporary media root."""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create(username="attachments")
+        cls.registration = Registration.objects.create(
+            registration_title="Attachments",
+            created_by=user,
+        )
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def attach(self, contents, filename="file.pdf"):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Attachment.objects.create(
+                registration=self.registration,
+                upload=ContentFile(contents, name=filename),
+            )
+
+
+
+class BlobTests(AttachmentTestCase):
+    """Attachments with the same contents share a stored file, which is
+    removed once no attachment refers to it anymore."""
+
+    def delete(self, attachment):
+        with self.captureOnCommitCallbacks(execute=True):
+            attachment.delete()
+
+    def without_grace_period(self):
+        return mock.patch.object(storage, "BLOB_GRACE_PERIOD", timedelta(0))
+
+    def exists(self, name):
+        return storage.attachment_storage.exists(name)
+
+    def test_shared(self):
+        first = self.attach(b"contents", "first.pdf")
+        second = self.attach(b"contents", "second.pdf")
+        other = self.attach(b"other contents")
+        self.assertEqual(first.upload.name, second.upload.name)
+        self.assertNotEqual(first.upload.name, other.upload.name)
+        self.assertTrue(first.upload.name.startswith("attachments/"))
+        self.assertEqual(second.get_filename(), "second.pdf")
+
+    def test_release_on_delete(self):
+        first = self.attach(b"contents")
+        second = self.attach(b"contents")
+        name = first.upload.name
+        with self.without_grace_period():
+            self.delete(first)
+            self.assertTrue(self.exists(name))
+            self.delete(second)
+        self.assertFalse(self.exists(name))
+
+    def test_release_on_replace(self):
+        attachment = self.attach(b"contents")
+        name = attachment.upload.name
+        with self.without_grace_period(), \
+                self.captureOnCommitCallbacks(execute=True):
+            attachment.upload = ContentFile(b"new contents", name="new.pdf")
+            attachment.save()
+        self.assertFalse(self.exists(name))
+        self.assertTrue(self.exists(attachment.upload.name))
+
+    def test_grace_period(self):
+        # The file was just reused, possibly by an attachment that
+        # isn't committed yet
+        attachment = self.attach(b"contents")
+        name = attachment.upload.name
+        self.delete(attachment)
+        self.assertTrue(self.exists(name))
+        self.assertEqual(storage.remove_unreferenced_blobs(), 0)
+        with self.without_grace_period():
+            self.assertEqual(storage.remove_unreferenced_blobs(), 1)
+        self.assertFalse(self.exists(name))
+
+    def test_reuse_renews_grace_period(self):
+        attachment = self.attach(b"contents")
+        path = storage.attachment_storage.path(attachment.upload.name)
+        os.utime(path, (0, 0))
+        self.assertFalse(
+            storage.attachment_storage.is_recent(attachment.upload.name),
+        )
+        self.attach(b"contents")
+        self.assertTrue(
+            storage.attachment_storage.is_recent(attachment.upload.name),
+        )
+
+    def test_outside_blob_dir(self):
+        # Such as files that were missing when migration 0044 moved
+        # the others
+        name = storage.attachment_storage.save("old.pdf", ContentFile(b"old"))
+        with self.without_grace_period():
+            storage.release_blob(name)
+            self.assertEqual(storage.remove_unreferenced_blobs(), 0)
+        self.assertTrue(self.exists(name))
+
+
+class DownloadTests(AttachmentTestCase):
+
+    contents = b"0123456789"
+
+    def setUp(self):
+        super().setUp()
+        self.attachment = self.attach(self.contents, "report.pdf")
+        self.etag = f'"{self.attachment.sha256}"'
+
+    def download(self, **headers):
+        request = RequestFactory().get("/", headers=headers)
+        return downloads.serve_attachment(request, self.attachment)
+
+    def get_content(self, response):
+        return b"".join(response.streaming_content)
+
+    def test_whole_file(self):
+        response = self.download()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_content(response), self.contents)
+        self.assertEqual(response["Content-Length"], "10")
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(response["ETag"], self.etag)
+        self.assertIn('filename="report.pdf"', response["Content-Disposition"])
+        self.assertIn("private", response["Cache-Control"])
+
+    def test_range(self):
+        response = self.download(range="bytes=2-5")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.get_content(response), b"2345")
+        self.assertEqual(response["Content-Range"], "bytes 2-5/10")
+        self.assertEqual(response["Content-Length"], "4")
+
+    def test_suffix_range(self):
+        response = self.download(range="bytes=-3")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.get_content(response), b"789")
+        self.assertEqual(response["Content-Range"], "bytes 7-9/10")
+
+    def test_range_not_satisfiable(self):
+        response = self.download(range="bytes=20-30")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */10")
+
+    def test_multiple_ranges(self):
+        # Not supported, answered with the whole file
+        response = self.download(range="bytes=0-1,4-5")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_content(response), self.contents)
+
+    def test_if_range(self):
+        response = self.download(range="bytes=2-5", if_range=self.etag)
+        self.assertEqual(response.status_code, 206)
+        response = self.download(range="bytes=2-5", if_range='"changed"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_content(response), self.contents)
+
+    def test_if_none_match(self):
+        response = self.download(if_none_match=self.etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], self.etag)
+        response = self.download(if_none_match='"changed"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_xsendfile(self):
+        with mock.patch.object(downloads, "SENDFILE_BACKEND", "xsendfile"):
+            response = self.download(range="bytes=2-5")
+        # The web server takes care of the range
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(
+            response["X-Sendfile"],
+            storage.attachment_storage.path(self.attachment.upload.name),
+        )
+        self.assertEqual(response["Content-Type"], "application/pdf")
+
+    def test_nginx(self):
+        with mock.patch.object(downloads, "SENDFILE_BACKEND", "nginx"):
+            response = self.download()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(
+            response["X-Accel-Redirect"],
+            "/protected-media/" + self.attachment.upload.name,
+        )
+
+
+@override_settings(CACHES=BlueprintBenchmark.cache_settings)
+class AccessTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        FaqList.objects.create(slug="default")
+        User = get_user_model()
+        cls.creator = User.objects.create(username="access-creator")
+        cls.applicant = User.objects.create(username="access-applicant")
+        cls.stranger = User.objects.create(username="access-stranger")
+        cls.staff = User.objects.create(username="access-staff", is_staff=True)
+        # Privacy officers see every registration in the PO list, but
+        # only get access to those they are involved in
+        cls.po = BlueprintBenchmark(repeat=1).create_user()
+        cls.registration = Registration.objects.create(
+            registration_title="Access",
+            created_by=cls.creator,
+        )
+        cls.registration.applicants.add(cls.applicant)
+
+    def get(self, user, view=RegistrationOverview, reg_pk=None):
+        if reg_pk is None:
+            reg_pk = self.registration.pk
+        request = RequestFactory().get("/")
+        request.user = get_user_model().objects.get(pk=user.pk)
+        return view.as_view()(request, reg_pk=reg_pk)
+
+    def test_allowed(self):
+        for user in [self.creator, self.applicant, self.staff]:
+            with self.subTest(user=user.username):
+                self.assertEqual(self.get(user).status_code, 200)
+
+    def test_refused(self):
+        for user in [self.stranger, self.po]:
+            with self.subTest(user=user.username):
+                with self.assertRaises(PermissionDenied):
+                    self.get(user)
+
+    def test_not_found(self):
+        missing = self.registration.pk + 1000
+        for user in [self.stranger, self.staff]:
+            for view in [RegistrationOverview, AttachmentUploadView]:
+                with self.subTest(user=user.username, view=view.__name__):
+                    with self.assertRaises(Http404):
+                        self.get(user, view=view, reg_pk=missing)
+
+
+class BlueprintErrorsTests(SimpleTestCase):
+
+    def setUp(self):
+        self.errors = BlueprintErrors()
+        self.errors.add("goal")
+        self.errors.add("goal", "research_goal", "Required")
+        self.errors.add("goal", "research_goal", "Too short", "extra")
+        self.errors.add("goal", "faculty", "Required")
+        self.errors.add("software", "name", "Required")
+
+    def test_error(self):
+        error = self.errors.all_errors[2]
+        self.assertEqual(
+            error,
+            ("goal", "research_goal", "Too short", "extra"),
+        )
+        self.assertEqual(len(error), 4)
+        self.assertEqual(error[2], "Too short")
+        self.assertNotEqual(error, None)
+        self.assertNotEqual(error, "goal")
+        self.assertNotEqual(self.errors.all_errors[0], ("software",))
+
+    def test_hash(self):
+        error = self.errors.all_errors[1]
+        self.assertEqual(hash(error), hash(tuple(error)))
+        self.assertIn(("goal", "research_goal", "Required"), {error})
+        self.assertEqual(
+            len(set(self.errors.all_errors) | {tuple(error)}),
+            len(self.errors),
+        )
+
+    def test_by_slug(self):
+        self.assertEqual(len(self.errors["goal"]), 4)
+        self.assertEqual(
+            self.errors["software"],
+            [("software", "name", "Required")],
+        )
+        self.assertEqual(self.errors["unknown"], [])
+
+    def test_by_slug_field(self):
+        self.assertEqual(
+            self.errors["goal", "research_goal"],
+            [
+                ("goal", "research_goal", "Required"),
+                ("goal", "research_goal", "Too short", "extra"),
+            ],
+        )
+        self.assertEqual(
+            self.errors.search("goal", "research_goal", "Too short"),
+            [("goal", "research_goal", "Too short", "extra")],
+        )
+
+    def test_callables(self):
+        self.assertEqual(
+            self.errors.search(lambda slug: True, "name"),
+            [("software", "name", "Required")],
+        )
+        self.assertEqual(
+            self.errors.search("goal", lambda field: field.startswith("f")),
+            [("goal", "faculty", "Required")],
+        )
+
+    def test_truncate(self):
+        self.errors.truncate(2)
+        self.assertEqual(len(self.errors), 2)
+        self.assertEqual(len(self.errors["goal"]), 2)
+        self.assertEqual(self.errors["goal", "faculty"], [])
+        self.assertEqual(self.errors["software"], [])
+
+
+class UploadTests(AttachmentTestCase):
+
+    contents = b"0123456789"
+
+    def setUp(self):
+        super().setUp()
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        patch = mock.patch.object(uploads, "UPLOAD_TEMP_DIR", temp_dir)
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.upload = uploads.start_upload(
+            self.registration,
+            self.registration.created_by,
+            "report.pdf",
+            len(self.contents),
+        )
+
+    def send(self, start, end, data=None):
+        """Send the bytes from start up to end, of which the client
+        may only get data across."""
+        if data is None:
+            data = self.contents[start:end]
+        return uploads.receive_chunk(
+            self.upload,
+            io.BytesIO(data),
+            f"bytes {start}-{end - 1}/{len(self.contents)}",
+        )
+
+    def finish(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return uploads.finish_upload(self.upload)
+
+    def assertAttachment(self, attachment):
+        self.assertEqual(
+            attachment.sha256,
+            hashlib.sha256(self.contents).hexdigest(),
+        )
+        with attachment.upload.open("rb") as f:
+            self.assertEqual(f.read(), self.contents)
+        self.assertEqual(attachment.filename, "report.pdf")
+        self.assertEqual(os.listdir(uploads.UPLOAD_TEMP_DIR), [])
+        self.assertFalse(AttachmentUpload.objects.exists())
+
+    def test_chunks(self):
+        self.assertEqual(self.send(0, 4), 4)
+        self.assertFalse(uploads.is_complete(self.upload))
+        self.send(4, 10)
+        self.assertTrue(uploads.is_complete(self.upload))
+        self.assertAttachment(self.finish())
+
+    def test_offset(self):
+        self.send(0, 4)
+        with self.assertRaises(uploads.UploadError) as context:
+            self.send(6, 10)
+        self.assertEqual(context.exception.status, 409)
+        with self.assertRaises(uploads.UploadError):
+            # Ranges of another size of file
+            uploads.receive_chunk(
+                self.upload, io.BytesIO(b"456"), "bytes 4-6/20",
+            )
+        with mock.patch.object(uploads, "MAX_CHUNK_SIZE", 2), \
+                self.assertRaises(uploads.UploadError) as context:
+            self.send(4, 10)
+        self.assertEqual(context.exception.status, 413)
+        self.assertEqual(self.upload.offset, 4)
+
+    def test_resume(self):
+        # The connection dropped halfway through the chunk
+        self.assertEqual(self.send(0, 8, data=self.contents[:3]), 3)
+        self.assertEqual(self.upload.offset, 3)
+        # The rest arrives at another process, without the hash so far
+        uploads.HASHERS.discard(self.upload)
+        self.upload = AttachmentUpload.objects.get(pk=self.upload.pk)
+        self.send(3, 10)
+        self.assertAttachment(self.finish())
+
+    def test_rolled_back(self):
+        self.send(0, 10)
+        pk = self.upload.pk
+        path = uploads.get_temp_path(self.upload)
+        with self.assertRaises(ValueError), transaction.atomic():
+            uploads.finish_upload(self.upload)
+            raise ValueError
+        # The upload can still be finished
+        self.assertTrue(os.path.exists(path))
+        self.upload = AttachmentUpload.objects.get(pk=pk)
+        self.assertAttachment(self.finish())
+
+    def test_remove(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            uploads.remove_upload(self.upload)
+        self.assertEqual(os.listdir(uploads.UPLOAD_TEMP_DIR), [])
+        self.assertFalse(AttachmentUpload.objects.exists())
@@ -0,0 +1,101 @@
+"""
+Changing the status of many registrations at once.
+
+Privacy officers move registrations along in bulk, from the PO list or
+the admin. Every batch of registrations is changed with a single UPDATE
+that also bumps their revision, so that what was cached for their old
+revision is no longer used, see registrations.progress. Each change is
+recorded as a StatusChange. Registrations that aren't in a status
+the new status may be reached from are left alone.
+
+Bulk updates don't send signals, which is fine as long as the status
+is not part of anything else derived from a registration.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .models import Registration, StatusChange
+
+# New status, and the statuses it may be reached from
+TRANSITIONS = {
+    "registered": ["submitted"],
+    # Sent back to the applicant
+    "draft": ["submitted"],
+}
+# Registrations changed per UPDATE, keeping the IN list within the
+# parameter limits of the database
+BATCH_SIZE = getattr(settings, "PROCREG_STATUS_BATCH_SIZE", 500)
+
+
+class TransitionError(Exception):
+    pass
+
+
+class TransitionResult():
+
+    def __init__(self, status):
+        self.status = status
+        self.changed = []
+        self.skipped = []
+
+
+def get_allowed_statuses(status):
+    if status not in TRANSITIONS:
+        raise TransitionError(f"Can't change registrations to {status}")
+    return TRANSITIONS[status]
+
+
+def change_batch(pks, status, allowed, user, result):
+    # Lock the rows, so that their status can't change between
+    # checking it and updating it
+    current = dict(
+        Registration.objects.select_for_update().filter(
+            pk__in=pks,
+        ).values_list("pk", "status")
+    )
+    valid = [pk for pk in pks if current.get(pk) in allowed]
+    result.skipped += [pk for pk in pks if pk not in valid]
+    if not valid:
+        return
+    Registration.objects.filter(
+        pk__in=valid,
+        status__in=allowed,
+    ).update(
+        status=status,
+        revision=F("revision") + 1,
+    )
+    StatusChange.objects.bulk_create(
+        [
+            StatusChange(
+                registration_id=pk,
+                old_status=current[pk],
+                new_status=status,
+                changed_by=user,
+            )
+            for pk in valid
+        ]
+    )
+    result.changed += valid
+
+
+def bulk_transition(pks, status, user):
+    """
+    Change the status of the registrations with pks to status, as far
+    as TRANSITIONS allows. Returns a TransitionResult with the pks of
+    the registrations that were changed and of those that were skipped.
+    """
+    allowed = get_allowed_statuses(status)
+    # Unique, in the order given
+    pks = list(dict.fromkeys(int(pk) for pk in pks))
+    result = TransitionResult(status)
+    with transaction.atomic():
+        for start in range(0, len(pks), BATCH_SIZE):
+            change_batch(
+                pks[start:start + BATCH_SIZE],
+                status,
+                allowed,
+                user,
+                result,
+            )
+    return result
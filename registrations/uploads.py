@@ -0,0 +1,224 @@
+"""
+Chunked, resumable attachment uploads.
+
+A client first creates an AttachmentUpload with the file name and
+total size, then sends the file in byte ranges. Every range is
+streamed from the request to a temporary file in small pieces, while
+a SHA-256 of the file is updated. A client whose connection dropped
+asks for the current offset and continues from there. Once the last
+byte has arrived, the Attachment is created from the temporary file.
+"""
+import collections
+import hashlib
+import os
+import re
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Attachment, AttachmentUpload
+
+# Where partial uploads are kept. All processes serving uploads must
+# share this directory.
+UPLOAD_TEMP_DIR = getattr(
+    settings,
+    "PROCREG_UPLOAD_TEMP_DIR",
+    os.path.join(settings.MEDIA_ROOT, "uploads_in_progress"),
+)
+MAX_ATTACHMENT_SIZE = getattr(
+    settings,
+    "PROCREG_MAX_ATTACHMENT_SIZE",
+    1024 ** 3,
+)
+# Largest byte range accepted in a single request
+MAX_CHUNK_SIZE = getattr(
+    settings,
+    "PROCREG_UPLOAD_MAX_CHUNK_SIZE",
+    16 * 1024 ** 2,
+)
+# Uploads that haven't received anything for this long are removed
+UPLOAD_EXPIRY = getattr(
+    settings,
+    "PROCREG_UPLOAD_EXPIRY",
+    timedelta(days=1),
+)
+# Size of the pieces read from requests and files
+READ_SIZE = 64 * 1024
+
+CONTENT_RANGE = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+
+
+class UploadError(Exception):
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class HasherCache():
+    """
+    Keeps the SHA-256 of recent uploads in memory between chunks.
+
+    Hash state can't be stored, so if a chunk arrives at another
+    process, or after a restart, the hash of the bytes received so far
+    is computed again from the temporary file.
+    """
+
+    def __init__(self, size=64):
+        self.size = size
+        self.hashers = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, upload):
+        with self.lock:
+            offset, hasher = self.hashers.pop(upload.pk, (None, None))
+        if offset == upload.offset:
+            return hasher
+        hasher = hashlib.sha256()
+        with open(get_temp_path(upload), "rb") as f:
+            remaining = upload.offset
+            while remaining > 0:
+                data = f.read(min(READ_SIZE, remaining))
+                if not data:
+                    break
+                hasher.update(data)
+                remaining -= len(data)
+        return hasher
+
+    def put(self, upload, hasher):
+        with self.lock:
+            self.hashers[upload.pk] = (upload.offset, hasher)
+            while len(self.hashers) > self.size:
+                self.hashers.popitem(last=False)
+
+    def discard(self, upload):
+        with self.lock:
+            self.hashers.pop(upload.pk, None)
+
+
+HASHERS = HasherCache()
+
+
+def get_temp_path(upload):
+    return os.path.join(UPLOAD_TEMP_DIR, f"{upload.pk}.part")
+
+
+def start_upload(registration, user, filename, size, file_description=""):
+    filename = os.path.basename(filename or "").strip()
+    if not filename:
+        raise UploadError("A file name is required")
+    if size <= 0:
+        raise UploadError("Empty files can't be uploaded")
+    if size > MAX_ATTACHMENT_SIZE:
+        raise UploadError("File is too large", status=413)
+    upload = AttachmentUpload.objects.create(
+        registration=registration,
+        created_by=user,
+        filename=filename[:255],
+        file_description=file_description[:500],
+        size=size,
+    )
+    os.makedirs(UPLOAD_TEMP_DIR, exist_ok=True)
+    open(get_temp_path(upload), "wb").close()
+    return upload
+
+
+def parse_content_range(header):
+    """Return start, end (exclusive) and total size from a
+    Content-Range header."""
+    match = CONTENT_RANGE.match(header or "")
+    if not match:
+        raise UploadError("Missing or invalid Content-Range header")
+    start, last, total = (int(n) for n in match.groups())
+    if last < start:
+        raise UploadError("Invalid byte range")
+    return start, last + 1, total
+
+
+def receive_chunk(upload, stream, content_range):
+    """
+    Append the byte range in content_range, read from stream, to the
+    upload. upload must be locked by the caller. Returns the number of
+    bytes received, which may be less than requested if the client
+    disconnected.
+    """
+    start, end, total = parse_content_range(content_range)
+    if total != upload.size or end > upload.size:
+        raise UploadError("Byte range doesn't match the upload size")
+    if start != upload.offset:
+        raise UploadError("Byte range doesn't start at the offset", 409)
+    if end - start > MAX_CHUNK_SIZE:
+        raise UploadError("Byte range is too large", status=413)
+    hasher = HASHERS.get(upload)
+    received = 0
+    with open(get_temp_path(upload), "r+b") as f:
+        # Drop any bytes written after the last recorded offset
+        f.truncate(upload.offset)
+        f.seek(upload.offset)
+        remaining = end - start
+        while remaining > 0:
+            data = stream.read(min(READ_SIZE, remaining))
+            if not data:
+                break
+            f.write(data)
+            hasher.update(data)
+            received += len(data)
+            remaining -= len(data)
+    upload.offset += received
+    upload.save(update_fields=["offset", "updated_on"])
+    HASHERS.put(upload, hasher)
+    return received
+
+
+def is_complete(upload):
+    return upload.offset == upload.size
+
+
+def finish_upload(upload):
+    """Create the Attachment from a completely received upload."""
+    hasher = HASHERS.get(upload)
+    path = get_temp_path(upload)
+    attachment = Attachment(
+        registration=upload.registration,
+        file_description=upload.file_description,
+        filename=upload.filename,
+        sha256=hasher.hexdigest(),
+    )
+    # Nothing is written if the same file is already stored
+    with open(path, "rb") as f:
+        attachment.upload.save(upload.filename, File(f), save=False)
+    attachment.save()
+    remove_upload(upload)
+    return attachment
+
+
+def remove_temp_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def remove_upload(upload):
+    """Delete upload, and its temporary file once that is committed.
+    If the deletion is rolled back, the upload can still be finished."""
+    HASHERS.discard(upload)
+    path = get_temp_path(upload)
+    upload.delete()
+    transaction.on_commit(lambda: remove_temp_file(path))
+
+
+def remove_expired_uploads():
+    """Remove abandoned uploads. Returns the number removed."""
+    expired = AttachmentUpload.objects.filter(
+        updated_on__lt=timezone.now() - UPLOAD_EXPIRY,
+    )
+    count = 0
+    for upload in expired:
+        remove_upload(upload)
+        count += 1
+    return count
@@ -5,7 +5,10 @@ from .views import RegistrationsHomeView, RegistrationCreateView, \
     RegistrationSummaryView, \
     InvolvedManager, StepperView, BlueprintQuestionEditView, \
     ReceiverDeleteView, SoftwareDeleteView, LandingView, MyRegistrationsList, \
-    PORegistrationsList, AttachmentDeleteView, FaqDetailView
+    PORegistrationsList, AttachmentDeleteView, FaqDetailView, \
+    ToggleFavouriteView, PORegistrationsExport, AttachmentUploadStartView, \
+    AttachmentUploadView, AttachmentDownloadView, BlueprintStatsView, \
+    RegistrationCloneView, POBulkStatusView
 from .questions import QUESTIONS
 from .blueprints import RegistrationBlueprint
 from .models import ParticipantCategory
@@ -15,13 +18,39 @@ app_name = 'registrations'
 urlpatterns = [
     path('', MyRegistrationsList.as_view(), name='my_list'),
     path('po_list/', PORegistrationsList.as_view(), name='po_list'),
+    path('po_list/export/<str:export_format>/',
+         PORegistrationsExport.as_view(),
+         name='po_export',
+         ),
+    path('po_list/status/',
+         POBulkStatusView.as_view(),
+         name='po_bulk_status',
+         ),
     path('home/', RegistrationsHomeView.as_view(), name="home"),
     path('landing/', LandingView.as_view(), name='landing'),
     path('<int:reg_pk>/', RegistrationOverview.as_view(), name='overview'),
+    path('<int:reg_pk>/favourite/',
+         ToggleFavouriteView.as_view(),
+         name='toggle_favourite',
+         ),
     path('<int:reg_pk>/manager/',
          InvolvedManager.as_view(),
          name='involved_manager',
          ),
+    # Attachment files, before the question views which would match
+    # their urls as well
+    path('<int:reg_pk>/attachments/uploads/',
+         AttachmentUploadStartView.as_view(),
+         name='start_attachment_upload',
+         ),
+    path('<int:reg_pk>/attachments/uploads/<uuid:upload_pk>/',
+         AttachmentUploadView.as_view(),
+         name='attachment_upload',
+         ),
+    path('<int:reg_pk>/attachments/<int:attachment_pk>/download/',
+         AttachmentDownloadView.as_view(),
+         name='download_attachment',
+         ),
 
     # Question edit views
     path('<int:reg_pk>/<str:question>/edit/<int:question_pk>/',
@@ -43,6 +72,10 @@ urlpatterns = [
          name='summary',
          ),
     path('new/', RegistrationCreateView.as_view(), name='new_registration'),
+    path('<int:reg_pk>/clone/',
+         RegistrationCloneView.as_view(),
+         name='clone',
+         ),
     
     # Cruddy stuff
     path('delete/<int:reg_pk>/', RegistrationDeleteView.as_view(),
@@ -65,6 +98,10 @@ urlpatterns = [
          FaqDetailView.as_view(),
          name="display_faq",
          ),
+    path("stats/blueprints/",
+         BlueprintStatsView.as_view(),
+         name="blueprint_stats",
+         ),
 
     # Debug
     path('<int:reg_pk>/<str:question>/stepper/<int:question_pk>/',
@@ -1,15 +1,79 @@
 from django.template import Template
 from django.forms.utils import RenderableMixin
 from django.template import loader
+from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
 from django.utils.html import mark_safe
 
 import logging
+import uuid
 
 from registrations.models import Faq, FaqList
 
 logger = logging.getLogger(__name__)
 
+
+class FaqRegistry():
+    """
+    In-memory copy of all Faq and FaqList objects, shared by the whole
+    process so that rendering FAQ sidebars doesn't cost any queries.
+
+    It is loaded on first use and reloaded after invalidate() is called
+    from the Faq and FaqList signals. Invalidation goes through a
+    generation token in Django's cache, so that other processes
+    sharing that cache reload as well.
+    """
+
+    generation_key = "procreg:faq_registry:generation"
+
+    def __init__(self):
+        self.generation = None
+        self.faqlists = {}
+        self.faqs = {}
+
+    def ensure_loaded(self):
+        generation = cache.get(self.generation_key)
+        if generation is None:
+            generation = uuid.uuid4().hex
+            cache.add(self.generation_key, generation, None)
+            generation = cache.get(self.generation_key, generation)
+        if generation != self.generation:
+            self.load()
+            self.generation = generation
+
+    def load(self):
+        faqlists = FaqList.objects.prefetch_related("faqs")
+        self.faqlists = {faqlist.slug: faqlist for faqlist in faqlists}
+        self.faqs = {
+            faq.slug: faq for faq in Faq.objects.exclude(slug=None)
+        }
+
+    def invalidate(self):
+        self.generation = None
+        cache.set(self.generation_key, uuid.uuid4().hex, None)
+
+    def get_faqlist(self, slug):
+        self.ensure_loaded()
+        try:
+            return self.faqlists[slug]
+        except KeyError:
+            raise FaqList.DoesNotExist(
+                f"FaqList with slug {slug} does not exist",
+            )
+
+    def get_faq(self, slug):
+        self.ensure_loaded()
+        try:
+            return self.faqs[slug]
+        except KeyError:
+            raise Faq.DoesNotExist(
+                f"Faq with slug {slug} does not exist",
+            )
+
+
+FAQ_REGISTRY = FaqRegistry()
+
+
 class RenderableFaqList():
 
     template_name = "registrations/faqlist.html"
@@ -19,17 +83,12 @@ class RenderableFaqList():
         self.init_faqs = set(faqs)
         # Retrieve FaqList object
         try:
-            self.faqlist = FaqList.objects.get(
-                slug=slug,
-            )
-        except ObjectDoesNotExist as e:
+            self.faqlist = FAQ_REGISTRY.get_faqlist(slug)
+        except ObjectDoesNotExist:
             logger.warning(
                 f"Non-existent FAQList with slug {slug} was requested",
-                e
-            )
-            self.faqlist = FaqList.objects.get(
-                slug="default",
             )
+            self.faqlist = FAQ_REGISTRY.get_faqlist("default")
         # Add general helptext object
         self.help_text = RenderableHelpText(self.faqlist)
 
@@ -43,11 +102,10 @@ class RenderableFaqList():
                 # This must be a slug, convert it
                 # to a FAQ object first
                 try:
-                    faq = Faq.objects.get(slug=faq)
-                except ObjectDoesNotExist as e:
+                    faq = FAQ_REGISTRY.get_faq(faq)
+                except ObjectDoesNotExist:
                     logger.warning(
-                        f"Non-existent FAQList with slug {faq} was requested",
-                        e
+                        f"Non-existent FAQ with slug {faq} was requested",
                     )
             faqs.add(faq)
         return faqs
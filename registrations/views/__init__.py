@@ -4,8 +4,12 @@ from .views import RegistrationCreateView, LandingView, RegistrationsHomeView, \
     RegistrationOverview, RegistrationQuestionEditView, RegistrationDeleteView, \
     RegistrationSummaryView, \
     InvolvedManager, StepperView, BlueprintQuestionEditView, ReceiverDeleteView, \
-    SoftwareDeleteView, AttachmentDeleteView, FaqDetailView
-from .lists.listview import MyRegistrationsList, PORegistrationsList
+    SoftwareDeleteView, AttachmentDeleteView, FaqDetailView, \
+    AttachmentDownloadView, RegistrationCloneView
+from .lists.listview import MyRegistrationsList, PORegistrationsList, \
+    ToggleFavouriteView, PORegistrationsExport, POBulkStatusView
+from .uploads import AttachmentUploadStartView, AttachmentUploadView
+from .stats import BlueprintStatsView
 
 
 from django.utils.autoreload import (
@@ -1,13 +1,24 @@
 from django.views import generic
-from django.db.models import Q
+from django.db.models import Q, Exists, OuterRef
 from django.urls import reverse
+from django.shortcuts import get_object_or_404, redirect
+from django.http import Http404
+from django.utils import timezone
+from django.utils.http import url_has_allowed_host_and_scheme
 from django.utils.translation import gettext as _
+from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin, \
     UserPassesTestMixin, PermissionDenied
 from django.core.exceptions import ImproperlyConfigured
 from django import forms
 
+from main.utils import in_group
 from registrations.models import Registration
+from registrations.permissions import involved_in_registration, \
+    registrations_for_user
+from registrations.search import search
+from registrations import export, transitions
+from .pagination import CachedCountPaginator, CursorPaginator
 
 def nameget(user):
     if "" in [user.first_name, user.last_name]:
@@ -20,6 +31,28 @@ class SearchableListView(
 ):
     context_object_name = "results"
     paginate_by = 20
+    paginator_class = CachedCountPaginator
+    # Page with after/before cursors on (created_on, pk) instead of
+    # page numbers. Only used when results are ordered newest first,
+    # so not for ranked search results.
+    cursor_pagination = False
+    cursor_ordering = ("-created_on", "-pk")
+
+    def use_cursor_pagination(self, queryset):
+        return (
+            self.cursor_pagination and
+            tuple(queryset.query.order_by) == self.cursor_ordering
+        )
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.use_cursor_pagination(queryset):
+            return super().paginate_queryset(queryset, page_size)
+        paginator = CursorPaginator(queryset, page_size)
+        page = paginator.page(
+            after=self.request.GET.get("after"),
+            before=self.request.GET.get("before"),
+        )
+        return (paginator, page, page.object_list, page.has_other_pages())
 
     def get_context_data(self, *args, **kwargs):
         context = super().get_context_data(*args, **kwargs)
@@ -27,6 +60,9 @@ class SearchableListView(
         # concat_get_params which needs the current querydict to work.
         # It must be a copy or else it's immutable
         context["current_get_params"] = self.request.GET.copy()
+        context["cursor_pagination"] = isinstance(
+            context.get("paginator"), CursorPaginator,
+        )
         return context
 
     def get_form_kwargs(self,):
@@ -94,66 +130,57 @@ class MyRegistrationsList(
     paginate_by = 10
 
     def get_queryset(self,):
-        user = self.request.user
-        self.starting_qs = Registration.objects.filter(created_by=user)
+        self.starting_qs = Registration.objects.all()
         return self.apply_filters(self.starting_qs)
 
-    def apply_filters(self, qs,):
-        def favs(qs):
-            """Once implemented, this will filter a user's favourites"""
-            return Registration.objects.none()
-
-        def drafts(qs):
-            return qs.filter(status="draft")
+    def get_visible(self):
+        """Condition for the registrations shown in this list, before
+        filtering on status. Favourites are added to these."""
+        return involved_in_registration(self.request.user)
 
-        def submitted(qs):
-            return qs.filter(status="submitted")
+    # Status checkboxes and the status they include
+    status_filters = {
+        "include_drafts": "draft",
+        "include_submitted": "submitted",
+        "include_registered": "registered",
+    }
 
-        def registered(qs):
-            return qs.filter(status="registered")
+    def get_checked(self, form, name):
+        """Checkboxes are passed as an empty string when unchecked,
+        see the hidden inputs in the template."""
+        return form.fields[name].to_python(form[name].value())
 
-        filters = {
-            "include_favourites": favs,
-            "include_drafts": drafts,
-            "include_submitted": submitted,
-            "include_registered": registered,
-        }
+    def apply_filters(self, qs,):
         form = self.get_form()
-        checkboxes = {
-            name: form[name].value() for name in filters.keys()
-        }
-        to_be_applied = [
-            filters[f](qs) for f in filters if checkboxes[f] is not None
+        statuses = [
+            status for name, status in self.status_filters.items()
+            if self.get_checked(form, name)
         ]
-
-        output_qs = Registration.objects.none()
-        while to_be_applied != []:
-            f = to_be_applied.pop()
-            output_qs = output_qs | f
-
-        return self.apply_search(output_qs)
+        # A single condition. For the user's own registrations the
+        # database can use the (created_by, status, created_on) index
+        condition = self.get_visible() & Q(status__in=statuses)
+        if self.get_checked(form, "include_favourites"):
+            favourites = Registration.favourited_by.through.objects.filter(
+                user=self.request.user,
+            ).values("registration_id")
+            condition |= Q(pk__in=favourites)
+        qs = qs.filter(condition).order_by("-created_on", "-pk")
+        qs = qs.annotate(
+            is_favourite=Exists(
+                Registration.favourited_by.through.objects.filter(
+                    registration=OuterRef("pk"),
+                    user=self.request.user,
+                )
+            )
+        )
+        return self.apply_search(qs)
 
     def apply_search(self, qs):
         form = self.get_form()
-        query = form["search"].value()
-        query = query.strip().split()
-        if query in ["", None]:
-            return qs
-        filters = []
-        for w in query:
-            # The order of operations here is deliberate.
-            # Each word may occur in either of these fields.
-            filters += [
-                Q(title__icontains=w) | \
-                Q(created_by__first_name__icontains=w) | \
-                Q(created_by__last_name__icontains=w)
-            ]
-        while filters != []:
-            # And finally all the OR'ed filters get AND'ed together.
-            # Every word must match in at least one of the fields.
-            f = filters.pop(0)
-            qs = qs.filter(f)
-        return qs
+        query = form["search"].value() or ""
+        # Every word must match, results are ordered by relevance.
+        # See registrations.search
+        return search(qs, query)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -165,14 +192,156 @@ class PORegistrationsList(
         UserPassesTestMixin,
 ):
     template_name = "lists/po_list.html"
+    cursor_pagination = True
 
     def get_queryset(self):
-        self.starting_qs = Registration.objects.all()
+        self.starting_qs = Registration.objects.select_related("created_by")
         return self.apply_filters(self.starting_qs)
 
+    def get_visible(self):
+        return Q()
+
     def test_func(self):
+        return in_group(self.request.user, "PO")
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["export_formats"] = PORegistrationsExport.get_formats()
+        context["bulk_status_form"] = BulkStatusForm(auto_id="bulk_%s")
+        return context
+
+
+class PORegistrationsExport(
+        PORegistrationsList,
+):
+    """Download all registrations matching the PO list's search and
+    filters, as CSV or XLSX."""
+
+    @staticmethod
+    def get_formats():
+        formats = ["csv"]
+        if export.xlsx_available():
+            formats.append("xlsx")
+        return formats
+
+    def get(self, request, *args, **kwargs):
+        export_format = kwargs.get("export_format")
+        if export_format not in self.get_formats():
+            raise Http404(f"Export format {export_format} is not available")
+        registrations = export.RegistrationExport(self.get_queryset())
+        filename = "registrations_{}".format(
+            timezone.localdate().isoformat(),
+        )
+        if export_format == "xlsx":
+            return export.xlsx_response(registrations, filename)
+        return export.csv_response(registrations, filename)
+
+
+
+class BulkStatusForm(forms.Form):
+
+    registrations = forms.Field(
+        widget=forms.MultipleHiddenInput,
+    )
+    status = forms.ChoiceField(
+        choices=[
+            ("registered", _("registrations:lists:bulk_status_registered")),
+            ("draft", _("registrations:lists:bulk_status_draft")),
+        ],
+        widget=forms.Select(attrs={"class": "form-select w-auto me-2"}),
+    )
+
+    def clean_registrations(self):
+        try:
+            return [int(pk) for pk in self.cleaned_data["registrations"]]
+        except (TypeError, ValueError):
+            raise forms.ValidationError("Invalid registration")
+
+
+class POBulkStatusView(
+        LoginRequiredMixin,
+        UserPassesTestMixin,
+        generic.FormView,
+):
+    """Change the status of the registrations selected in the PO list,
+    see registrations.transitions."""
+
+    form_class = BulkStatusForm
+    http_method_names = ["post"]
+
+    def test_func(self):
+        return in_group(self.request.user, "PO")
+
+    def get_success_url(self):
+        url = self.request.POST.get("next")
+        if url and url_has_allowed_host_and_scheme(
+                url,
+                allowed_hosts={self.request.get_host()},
+        ):
+            return url
+        return reverse("registrations:po_list")
+
+    def form_valid(self, form):
+        result = transitions.bulk_transition(
+            form.cleaned_data["registrations"],
+            form.cleaned_data["status"],
+            self.request.user,
+        )
+        messages.success(
+            self.request,
+            _("registrations:lists:bulk_status_changed").format(
+                changed=len(result.changed),
+            ),
+        )
+        if result.skipped:
+            messages.warning(
+                self.request,
+                _("registrations:lists:bulk_status_skipped").format(
+                    skipped=len(result.skipped),
+                ),
+            )
+        return redirect(self.get_success_url())
+
+    def form_invalid(self, form):
+        messages.error(
+            self.request,
+            _("registrations:lists:bulk_status_invalid"),
+        )
+        return redirect(self.get_success_url())
+
+
+class ToggleFavouriteView(
+        LoginRequiredMixin,
+        generic.View,
+):
+    """Add a registration to the current user's favourites,
+    or remove it if it already is one."""
+
+    http_method_names = ["post"]
+
+    def get_visible_registrations(self):
         user = self.request.user
-        if "PO" in [g.name for g in user.groups.all()]:
-            return True
+        if in_group(user, "PO"):
+            return Registration.objects.all()
+        return registrations_for_user(user)
 
+    def get_success_url(self):
+        url = self.request.POST.get("next")
+        if url and url_has_allowed_host_and_scheme(
+                url,
+                allowed_hosts={self.request.get_host()},
+        ):
+            return url
+        return reverse("registrations:my_list")
 
+    def post(self, request, *args, **kwargs):
+        registration = get_object_or_404(
+            self.get_visible_registrations(),
+            pk=kwargs.get("reg_pk"),
+        )
+        user = request.user
+        if registration.favourited_by.filter(pk=user.pk).exists():
+            registration.favourited_by.remove(user)
+        else:
+            registration.favourited_by.add(user)
+        return redirect(self.get_success_url())
@@ -0,0 +1,155 @@
+import base64
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+# Counts are only used to show the number of results, so they
+# may be somewhat out of date. They are exact counts, cached for this
+# many seconds: a cache miss still runs a full COUNT.
+COUNT_CACHE_TIMEOUT = getattr(
+    settings,
+    "PROCREG_LIST_COUNT_CACHE_TIMEOUT",
+    60,
+)
+
+
+def get_cached_count(queryset):
+    """Return the number of results of queryset, cached on its SQL."""
+    try:
+        sql = str(queryset.query).encode("utf-8")
+    except EmptyResultSet:
+        # Conditions that can't match anything, like an empty IN
+        # list, don't compile to SQL
+        return 0
+    key = "procreg:list_count:" + hashlib.sha256(sql).hexdigest()
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, COUNT_CACHE_TIMEOUT)
+    return count
+
+
+class CachedCountPaginator(Paginator):
+    """Regular Paginator which caches its COUNT query."""
+
+    @cached_property
+    def count(self):
+        return get_cached_count(self.object_list)
+
+
+def encode_cursor(obj):
+    value = f"{obj.created_on.isoformat()}|{obj.pk}"
+    encoded = base64.urlsafe_b64encode(value.encode("utf-8"))
+    return encoded.decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Return the (created_on, pk) pair in cursor, or None if it
+    is missing or invalid."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value = base64.urlsafe_b64decode(padded.encode("ascii"))
+        created_on, pk = value.decode("utf-8").split("|")
+        created_on = parse_datetime(created_on)
+        pk = int(pk)
+    except (ValueError, UnicodeError):
+        return None
+    if created_on is None:
+        return None
+    return created_on, pk
+
+
+class CursorPage():
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        if not self.has_next():
+            return None
+        return encode_cursor(self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous():
+            return None
+        return encode_cursor(self.object_list[0])
+
+
+class CursorPaginator():
+    """
+    Keyset pagination on (created_on, pk), newest first. Both never
+    change after a registration is created, so a registration doesn't
+    move between pages while someone is paging.
+
+    Instead of an OFFSET, every page continues from the last row of the
+    previous one, so deep pages cost the same as the first. Pages are
+    addressed with an after or before cursor rather than a number.
+    """
+
+    def __init__(self, object_list, per_page):
+        self.object_list = object_list
+        self.per_page = per_page
+
+    @cached_property
+    def count(self):
+        return get_cached_count(self.object_list)
+
+    def page(self, after=None, before=None):
+        qs = self.object_list
+        after = decode_cursor(after)
+        before = decode_cursor(before) if after is None else None
+        if before is not None:
+            created_on, pk = before
+            qs = qs.filter(
+                Q(created_on__gt=created_on) |
+                Q(created_on=created_on, pk__gt=pk)
+            ).order_by("created_on", "pk")
+        else:
+            if after is not None:
+                created_on, pk = after
+                qs = qs.filter(
+                    Q(created_on__lt=created_on) |
+                    Q(created_on=created_on, pk__lt=pk)
+                )
+            qs = qs.order_by("-created_on", "-pk")
+        # One extra row tells whether there is another page
+        rows = list(qs[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if before is not None:
+            rows.reverse()
+            return CursorPage(rows, self, has_next=True, has_previous=more)
+        return CursorPage(
+            rows,
+            self,
+            has_next=more,
+            has_previous=after is not None,
+        )
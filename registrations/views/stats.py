@@ -0,0 +1,31 @@
+from django.contrib.auth.mixins import LoginRequiredMixin, \
+    UserPassesTestMixin
+from django.shortcuts import redirect
+from django.urls import reverse
+from django.views import generic
+
+from registrations.instrumentation import STATS, ENABLED
+
+
+class BlueprintStatsView(
+        LoginRequiredMixin,
+        UserPassesTestMixin,
+        generic.TemplateView,
+):
+    """Recent timings of the consumer chain, per consumer class.
+    Only shows the samples of the process serving the request."""
+
+    template_name = "registrations/blueprint_stats.html"
+
+    def test_func(self):
+        return self.request.user.is_superuser
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["enabled"] = ENABLED
+        context["rows"] = STATS.summary()
+        return context
+
+    def post(self, request, *args, **kwargs):
+        STATS.clear()
+        return redirect(reverse("registrations:blueprint_stats"))
@@ -0,0 +1,135 @@
+from django.db import transaction
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views import generic
+
+from registrations.mixins import RegistrationAccessMixin
+from registrations.models import AttachmentUpload
+from registrations import uploads
+
+
+class AttachmentUploadMixin(
+        RegistrationAccessMixin,
+):
+    """Allow those with access to a registration to upload
+    attachments to it."""
+
+    def get_upload_url(self, upload):
+        return reverse(
+            "registrations:attachment_upload",
+            kwargs={
+                "reg_pk": upload.registration_id,
+                "upload_pk": upload.pk,
+            },
+        )
+
+    def get_status(self, upload):
+        return {
+            "url": self.get_upload_url(upload),
+            "offset": upload.offset,
+            "size": upload.size,
+        }
+
+    def error_response(self, error, upload=None):
+        data = {"error": str(error)}
+        if upload is not None:
+            data.update(self.get_status(upload))
+        return JsonResponse(data, status=error.status)
+
+
+class AttachmentUploadStartView(
+        AttachmentUploadMixin,
+        generic.View,
+):
+    """Start a chunked upload. Expects the file name and size of the
+    file in POST and returns the url to send the chunks to."""
+
+    http_method_names = ["post"]
+
+    def post(self, request, *args, **kwargs):
+        try:
+            size = int(request.POST.get("size", ""))
+        except ValueError:
+            return JsonResponse({"error": "Invalid size"}, status=400)
+        try:
+            upload = uploads.start_upload(
+                self.get_registration(),
+                request.user,
+                request.POST.get("filename", ""),
+                size,
+                file_description=request.POST.get("file_description", ""),
+            )
+        except uploads.UploadError as error:
+            return self.error_response(error)
+        return JsonResponse(self.get_status(upload), status=201)
+
+
+class AttachmentUploadView(
+        AttachmentUploadMixin,
+        generic.View,
+):
+    """Receives the chunks of an upload with PUT, each with a
+    Content-Range header. GET returns how far the upload has come,
+    so that an interrupted upload can continue where it stopped."""
+
+    http_method_names = ["get", "put", "delete"]
+
+    def get_upload_queryset(self):
+        return AttachmentUpload.objects.filter(
+            registration=self.get_registration(),
+            created_by=self.request.user,
+        )
+
+    def get(self, request, *args, **kwargs):
+        upload = get_object_or_404(
+            self.get_upload_queryset(),
+            pk=kwargs.get("upload_pk"),
+        )
+        return JsonResponse(self.get_status(upload))
+
+    def put(self, request, *args, **kwargs):
+        with transaction.atomic():
+            # Chunks of the same upload are received one at a time
+            upload = get_object_or_404(
+                self.get_upload_queryset().select_for_update(),
+                pk=kwargs.get("upload_pk"),
+            )
+            try:
+                uploads.receive_chunk(
+                    upload,
+                    request,
+                    request.headers.get("Content-Range"),
+                )
+            except uploads.UploadError as error:
+                # Tell the client where to continue from
+                return self.error_response(error, upload)
+            status = self.get_status(upload)
+            if not uploads.is_complete(upload):
+                status["complete"] = False
+                return JsonResponse(status)
+            attachment = uploads.finish_upload(upload)
+        status.update(
+            {
+                "complete": True,
+                "attachment_pk": attachment.pk,
+                "sha256": attachment.sha256,
+                "success_url": reverse(
+                    "registrations:edit_question",
+                    kwargs={
+                        "reg_pk": attachment.registration_id,
+                        "question": "attachments",
+                        "question_pk": attachment.registration_id,
+                    },
+                ),
+            }
+        )
+        return JsonResponse(status)
+
+    def delete(self, request, *args, **kwargs):
+        upload = get_object_or_404(
+            self.get_upload_queryset(),
+            pk=kwargs.get("upload_pk"),
+        )
+        uploads.remove_upload(upload)
+        return JsonResponse({"deleted": True})
@@ -1,6 +1,6 @@
 import logging
 
-from django.shortcuts import render
+from django.shortcuts import render, get_object_or_404, redirect
 from django.views import generic
 from django.urls import reverse_lazy, reverse
 from django.contrib.auth.mixins import LoginRequiredMixin
@@ -15,9 +15,12 @@ from django import forms
 from registrations.models import Registration, ParticipantCategory, Involved, \
     Software, Receiver, Faq, Attachment, Faq
 from registrations.questions import NewRegistrationQuestion, FacultyQuestion, CategoryQuestion
-from registrations.mixins import RegistrationMixin, RegistrationQuestionMixin
+from registrations.mixins import RegistrationMixin, RegistrationQuestionMixin, \
+    RegistrationAccessMixin
 from registrations.progress import ProgressItemMixin
 from registrations.blueprints import RegistrationBlueprint
+from registrations.downloads import serve_attachment
+from registrations.clone import clone_registration
 
 debug = logging.debug
 
@@ -128,10 +131,9 @@ class BlueprintQuestionEditView(
 ):
 
     def get_success_url(self):
-        # Rebuild blueprint before getting desired next
+        # Update blueprint before getting desired next
         # The answer might change if new info was POSTed
-        self.blueprint = None
-        self.blueprint = self.get_blueprint()
+        self.refresh_blueprint()
         if hasattr(self.get_question(), 'get_success_url'):
             return self.get_question().get_success_url()
         bp_next = self.blueprint.get_desired_next_url()
@@ -177,10 +179,9 @@ class RegistrationQuestionEditView(
     def get_success_url(self):
         if hasattr(self.get_question(), 'get_success_url'):
             return self.question.get_success_url()
-        # Rebuild blueprint before getting desired next
+        # Update blueprint before getting desired next
         # The answer might change if new info was POSTed
-        self.blueprint = None
-        self.blueprint = self.get_blueprint()
+        self.refresh_blueprint()
         bp_next = self.blueprint.get_desired_next_url()
         if bp_next:
             return bp_next
@@ -240,8 +241,8 @@ class RegistrationCreateView(
 
 
 class RegistrationDeleteView(
+        RegistrationAccessMixin,
         generic.DeleteView,
-        RegistrationQuestionMixin,
 ):
 
     "Basic Django delete view for Registrations"
@@ -252,6 +253,28 @@ class RegistrationDeleteView(
     pk_url_kwarg = 'reg_pk'
 
 
+class RegistrationCloneView(
+        RegistrationAccessMixin,
+        generic.View,
+):
+
+    "Start a new Registration as a copy of an existing one"
+
+    http_method_names = ["post"]
+
+    def post(self, request, *args, **kwargs):
+        registration = clone_registration(
+            self.get_registration(),
+            request.user,
+        )
+        return redirect(
+            reverse(
+                "registrations:overview",
+                kwargs={"reg_pk": registration.pk},
+            )
+        )
+
+
 class InvolvedManager(
         ProgressItemMixin,
         RegistrationQuestionMixin,
@@ -291,12 +314,11 @@ class InvolvedManager(
                 "existing": [],
             } for group_type in self.get_involved_groups()
         }
-        for question in self.blueprint.questions:
-            if question.slug == "new_involved":
-                if question.instance.pk is not None:
-                    questions[question.instance.group_type]["existing"] += [question]
-                else:
-                    questions[question.instance.group_type]["new"] = question
+        for question in self.blueprint.questions.with_slug("new_involved"):
+            if question.instance.pk is not None:
+                questions[question.instance.group_type]["existing"] += [question]
+            else:
+                questions[question.instance.group_type]["new"] = question
         return questions
 
     def get_involved_groups(self):
@@ -321,6 +343,7 @@ class DocumentsManager(
 
 
 class ReceiverDeleteView(
+        RegistrationAccessMixin,
         generic.DeleteView,
         BlueprintMixin,
 ):
@@ -331,16 +354,25 @@ class ReceiverDeleteView(
     pk_url_kwarg = "receiver_pk"
     model = Receiver
 
+    def get_queryset(self):
+        # Only sub-objects of the registration access was checked for
+        return super().get_queryset().filter(
+            registration_id=self.kwargs.get("reg_pk"),
+        )
+
     def get_success_url(self):
+        # No need to build the blueprint for this
+        reg_pk = self.kwargs.get("reg_pk")
         return reverse(
             "registrations:edit_question",
             kwargs={
-                "reg_pk": self.get_blueprint().object.pk,
+                "reg_pk": reg_pk,
                 "question": "receivers",
-                "question_pk": self.get_blueprint().object.pk,
+                "question_pk": reg_pk,
             })
 
 class SoftwareDeleteView(
+        RegistrationAccessMixin,
         generic.DeleteView,
         BlueprintMixin,
 ):
@@ -351,17 +383,26 @@ class SoftwareDeleteView(
     pk_url_kwarg = "software_pk"
     model = Software
 
+    def get_queryset(self):
+        # Only sub-objects of the registration access was checked for
+        return super().get_queryset().filter(
+            registration_id=self.kwargs.get("reg_pk"),
+        )
+
     def get_success_url(self):
+        # No need to build the blueprint for this
+        reg_pk = self.kwargs.get("reg_pk")
         return reverse(
             "registrations:edit_question",
             kwargs={
-                "reg_pk": self.get_blueprint().object.pk,
+                "reg_pk": reg_pk,
                 "question": "software",
-                "question_pk": self.get_blueprint().object.pk,
+                "question_pk": reg_pk,
             })
 
 
 class AttachmentDeleteView(
+        RegistrationAccessMixin,
         generic.DeleteView,
         BlueprintMixin,
 ):
@@ -372,16 +413,43 @@ class AttachmentDeleteView(
     pk_url_kwarg = "attachment_pk"
     model = Attachment
 
+    def get_queryset(self):
+        # Only sub-objects of the registration access was checked for
+        return super().get_queryset().filter(
+            registration_id=self.kwargs.get("reg_pk"),
+        )
+
     def get_success_url(self):
+        # No need to build the blueprint for this
+        reg_pk = self.kwargs.get("reg_pk")
         return reverse(
             "registrations:edit_question",
             kwargs={
-                "reg_pk": self.get_blueprint().object.pk,
+                "reg_pk": reg_pk,
                 "question": "attachments",
-                "question_pk": self.get_blueprint().object.pk,
+                "question_pk": reg_pk,
             })
 
 
+class AttachmentDownloadView(
+        RegistrationMixin,
+        generic.View,
+):
+
+    """Download an attachment, for those who have access to its
+    registration."""
+
+    http_method_names = ["get", "head"]
+
+    def get(self, request, *args, **kwargs):
+        attachment = get_object_or_404(
+            Attachment,
+            pk=kwargs.get("attachment_pk"),
+            registration=self.get_registration(),
+        )
+        return serve_attachment(request, attachment)
+
+
 class StepperView(RegistrationQuestionEditView):
     template_name = "registrations/stepper_view.html"
 